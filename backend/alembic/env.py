@@ -18,6 +18,8 @@ load_dotenv()
 from app.db.database import Base
 from app.models.models import User, Group, Message
 from app.models.phone_pool import PhoneNumber, OTPVerification  
+from app.models.outbound import OutboundMessage
+from app.models.inbound import InboundMessage
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
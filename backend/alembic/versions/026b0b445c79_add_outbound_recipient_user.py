@@ -0,0 +1,26 @@
+"""Add recipient_user_id to outbound_messages
+
+Revision ID: 026b0b445c79
+Revises: e122fda3d091
+Create Date: 2026-10-17 10:03:55.472913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '026b0b445c79'
+down_revision = 'e122fda3d091'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('outbound_messages', sa.Column('recipient_user_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('outbound_messages_recipient_user_id_fkey', 'outbound_messages', 'users', ['recipient_user_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('outbound_messages_recipient_user_id_fkey', 'outbound_messages', type_='foreignkey')
+    op.drop_column('outbound_messages', 'recipient_user_id')
@@ -0,0 +1,24 @@
+"""Add (group_id, id) index on messages
+
+Revision ID: 46541634ca73
+Revises: f067d75a8e77
+Create Date: 2026-10-17 13:37:52.961044
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '46541634ca73'
+down_revision = 'f067d75a8e77'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_messages_group_id_id', 'messages', ['group_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_group_id_id', table_name='messages')
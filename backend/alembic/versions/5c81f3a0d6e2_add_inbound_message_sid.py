@@ -0,0 +1,26 @@
+"""Add unique message_sid to inbound_messages
+
+Revision ID: 5c81f3a0d6e2
+Revises: b7d2e4f19a30
+Create Date: 2026-10-17 15:42:08.204519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c81f3a0d6e2'
+down_revision = 'b7d2e4f19a30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('inbound_messages', sa.Column('message_sid', sa.String(length=34), nullable=True))
+    op.create_index('ix_inbound_messages_message_sid', 'inbound_messages', ['message_sid'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inbound_messages_message_sid', table_name='inbound_messages')
+    op.drop_column('inbound_messages', 'message_sid')
@@ -0,0 +1,47 @@
+"""Add groups.member_count and unique user_groups membership
+
+Revision ID: 789a37f74321
+Revises: 026b0b445c79
+Create Date: 2026-10-17 11:26:08.730511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '789a37f74321'
+down_revision = '026b0b445c79'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Drop duplicate memberships so the unique constraint can be created
+    op.execute("""
+        DELETE FROM user_groups a
+        USING user_groups b
+        WHERE a.ctid < b.ctid
+          AND a.user_id = b.user_id
+          AND a.group_id = b.group_id
+    """)
+    op.create_unique_constraint('uq_user_groups_group_user', 'user_groups', ['group_id', 'user_id'])
+    op.create_index(op.f('ix_user_groups_user_id'), 'user_groups', ['user_id'], unique=False)
+
+    op.add_column('groups', sa.Column('member_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE groups
+        SET member_count = counts.member_count
+        FROM (
+            SELECT group_id, count(*) AS member_count
+            FROM user_groups
+            GROUP BY group_id
+        ) AS counts
+        WHERE counts.group_id = groups.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('groups', 'member_count')
+    op.drop_index(op.f('ix_user_groups_user_id'), table_name='user_groups')
+    op.drop_constraint('uq_user_groups_group_user', 'user_groups', type_='unique')
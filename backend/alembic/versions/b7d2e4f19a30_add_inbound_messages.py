@@ -0,0 +1,46 @@
+"""Add inbound_messages queue
+
+Revision ID: b7d2e4f19a30
+Revises: 46541634ca73
+Create Date: 2026-10-17 15:04:21.530877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4f19a30'
+down_revision = '46541634ca73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('inbound_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('from_number', sa.String(length=20), nullable=False),
+    sa.Column('to_number', sa.String(length=20), nullable=False),
+    sa.Column('body', sa.String(length=1600), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'PROCESSING', 'PROCESSED', 'FAILED', name='inboundstatus'), server_default='PENDING', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('result', sa.String(length=500), nullable=True),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('message_id', sa.Integer(), nullable=True),
+    sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_inbound_messages_id'), 'inbound_messages', ['id'], unique=False)
+    op.create_index('ix_inbound_messages_pending', 'inbound_messages', ['available_at', 'id'], unique=False, postgresql_where=sa.text("status = 'PENDING'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inbound_messages_pending', table_name='inbound_messages', postgresql_where=sa.text("status = 'PENDING'"))
+    op.drop_index(op.f('ix_inbound_messages_id'), table_name='inbound_messages')
+    op.drop_table('inbound_messages')
+    sa.Enum(name='inboundstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,45 @@
+"""Add outbound_messages queue
+
+Revision ID: e122fda3d091
+Revises: 73b24227c46f
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e122fda3d091'
+down_revision = '73b24227c46f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('outbound_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=True),
+    sa.Column('to_number', sa.String(length=20), nullable=False),
+    sa.Column('from_number', sa.String(length=20), nullable=True),
+    sa.Column('body', sa.String(length=1600), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'SENDING', 'SENT', 'FAILED', name='outboundstatus'), server_default='PENDING', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('twilio_sid', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbound_messages_id'), 'outbound_messages', ['id'], unique=False)
+    op.create_index('ix_outbound_messages_pending', 'outbound_messages', ['available_at', 'id'], unique=False, postgresql_where=sa.text("status = 'PENDING'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbound_messages_pending', table_name='outbound_messages', postgresql_where=sa.text("status = 'PENDING'"))
+    op.drop_index(op.f('ix_outbound_messages_id'), table_name='outbound_messages')
+    op.drop_table('outbound_messages')
+    sa.Enum(name='outboundstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,26 @@
+"""Add pg_trgm GIN index on groups.name
+
+Revision ID: f067d75a8e77
+Revises: 789a37f74321
+Create Date: 2026-10-17 12:41:19.205337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f067d75a8e77'
+down_revision = '789a37f74321'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_groups_name_trgm', 'groups', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_groups_name_trgm', table_name='groups', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    # pg_trgm is left installed; other objects may depend on it
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
+from app.db import database
 from app.db.database import get_db
+from app.db.pool import pool_metrics
 from app.models.phone_pool import PhoneNumber, PhoneStatus
+from app.models.outbound import OutboundMessage, OutboundStatus
+from app.services.outbound_queue import worker_pool
+from app.services import events
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -27,6 +33,13 @@ class PhoneNumberResponse(BaseModel):
         from_attributes = True
 
 
+class OutboundQueueDepths(BaseModel):
+    # Rows waiting in outbound_messages, by sender number
+    pending: Dict[str, int]
+    # Rows claimed by this process and waiting on the sender's rate limit
+    scheduled: Dict[str, int]
+
+
 @router.post("/phone-numbers", response_model=PhoneNumberResponse)
 def register_phone_number(
     phone: PhoneNumberCreate, db: Session = Depends(get_db)
@@ -109,10 +122,45 @@ def update_phone_status(
             status_code=400, detail="Invalid status value"
         )
 
+    previous_group_id = phone.group_id
     phone.status = phone_status
     if phone_status != PhoneStatus.ASSIGNED:
         phone.group_id = None
         phone.assigned_at = None
+    if previous_group_id:
+        # Routing caches must drop or re-add the number
+        events.notify(
+            db, events.group_topic(previous_group_id), "phone_assigned",
+            {"group_id": phone.group_id,
+             "phone_number": phone.phone_number},
+        )
 
     db.commit()
     return {"message": f"Phone number status updated to {phone_status}"}
+
+
+@router.get("/outbound/queues", response_model=OutboundQueueDepths)
+def outbound_queue_depths(db: Session = Depends(get_db)):
+    """Outbound SMS queue depth per sender number"""
+    pending = db.query(
+        OutboundMessage.from_number, func.count(OutboundMessage.id)
+    ).filter(
+        OutboundMessage.status == OutboundStatus.PENDING
+    ).group_by(OutboundMessage.from_number).all()
+
+    return {
+        "pending": {number or "default": count for number, count in pending},
+        "scheduled": {
+            number or "default": depth
+            for number, depth in worker_pool.queue_depths().items()
+        },
+    }
+
+
+@router.get("/db/pool")
+def database_pool_metrics():
+    """Connection pool occupancy and checkout wait times per engine"""
+    return {
+        name: pool_metrics(pool)
+        for name, pool in database.engine_pools().items()
+    }
@@ -0,0 +1,200 @@
+"""
+Async versions of the hot endpoints, served when DB_ASYNC=true.
+
+These run on the event loop with an AsyncSession (asyncpg) instead of
+occupying a threadpool slot while waiting on Postgres, so one worker can
+hold thousands of in-flight requests. main.py registers these routers
+ahead of the sync ones, so they take over the same paths; everything else
+stays on the sync routers. Queries are shared with the sync handlers.
+"""
+from fastapi import APIRouter, Depends, Form, Header, HTTPException, Query
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.api.groups import (
+    delta_check, group_listing_statement, group_responses, history_page,
+    history_statement, latest_message_id_statement
+)
+from app.api.sms import twiml_ack, webhook_payload
+from app.core import metrics
+from app.db.database import get_async_db, get_async_read_db
+from app.models.models import Group, User, Message
+from app.models.phone_pool import PhoneNumber
+from app.models.schemas import GroupResponse, MessageCreate, MessageResponse
+from app.services import (
+    events, inbound_queue, membership_cache, routing_cache
+)
+from app.services.outbound_queue import (
+    enqueue_group_fanout_async, notify_workers
+)
+from app.services.sms_routing import resolve_route, webhook_route_statement
+from app.services.sms_service import format_group_message
+
+groups_router = APIRouter()
+sms_router = APIRouter()
+
+
+@groups_router.get("/", response_model=List[GroupResponse])
+async def get_groups(
+    search: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    result = await db.execute(group_listing_statement(search, limit, offset))
+    return group_responses(result.all())
+
+
+@groups_router.get("/{group_id}/messages",
+                   response_model=List[MessageResponse])
+async def get_group_messages(
+    group_id: int,
+    response: Response,
+    before: Optional[int] = Query(
+        None, description="Return messages older than this message id"
+    ),
+    after: Optional[int] = Query(
+        None, description="Return messages newer than this message id"
+    ),
+    since_id: Optional[int] = Query(
+        None, description="Delta sync: only messages after this id"
+    ),
+    limit: int = Query(50, ge=1, le=200),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if if_none_match is not None or since_id is not None:
+        latest_id = (await db.execute(
+            latest_message_id_statement(group_id)
+        )).scalar() or 0
+        early, after = delta_check(group_id, latest_id, response, since_id,
+                                   before, after, limit, if_none_match)
+        if early is not None:
+            return early
+
+    result = await db.execute(history_statement(group_id, before, after,
+                                                limit))
+    return history_page(group_id, result.all(), response, before,
+                        after, limit)
+
+
+async def _post_message(db: AsyncSession, group_id: int, group_name: str,
+                        group_phone: Optional[str], user_id: int,
+                        user_name: str, content: str) -> MessageResponse:
+    """Store the message, queue its fan-out and publish it.
+
+    The caller commits and then wakes the outbound workers.
+    """
+    db_message = Message(content=content, user_id=user_id,
+                         group_id=group_id)
+    db.add(db_message)
+    await db.flush()
+
+    await enqueue_group_fanout_async(
+        db,
+        group_id,
+        user_id,
+        format_group_message(user_name, content, group_name),
+        from_number=group_phone,
+        message_id=db_message.id,
+    )
+    message_response = MessageResponse(
+        id=db_message.id,
+        content=db_message.content,
+        user_id=user_id,
+        group_id=group_id,
+        created_at=db_message.created_at,
+        user_name=user_name,
+    )
+    await events.notify_async(
+        db, events.group_topic(group_id), "message_created",
+        message_response.model_dump(mode="json"),
+    )
+    return message_response
+
+
+@groups_router.post("/{group_id}/messages", response_model=MessageResponse)
+async def send_message(
+    group_id: int, message: MessageCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    group = (await db.execute(
+        select(Group.id, Group.name,
+               PhoneNumber.phone_number.label("group_phone"))
+        .outerjoin(PhoneNumber, PhoneNumber.group_id == Group.id)
+        .where(Group.id == group_id)
+    )).first()
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    user = (await db.execute(
+        select(User.id, User.name).where(User.id == message.user_id)
+    )).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Same cache as the sync endpoint; the fan-out reuses the entry
+    if not await membership_cache.group_members.is_member_async(
+        db, group_id, user.id
+    ):
+        raise HTTPException(status_code=403, detail="User not in group")
+
+    message_response = await _post_message(
+        db, group.id, group.name, group.group_phone, user.id, user.name,
+        message.content
+    )
+    await db.commit()
+    notify_workers()
+    return message_response
+
+
+async def _receive_inline(db: AsyncSession, payload: dict) -> str:
+    """``inbound_queue.receive_inline`` for an AsyncSession"""
+    inbound_id = None
+    if payload.get("MessageSid"):
+        inbound_id = (await db.execute(
+            inbound_queue.inline_insert(payload)
+        )).scalar()
+        if inbound_id is None:
+            return inbound_queue.DUPLICATE_RESULT
+
+    to_number = payload["To"]
+    rows = (await db.execute(webhook_route_statement(payload["From"]))).all()
+    routed = await routing_cache.pool_numbers.lookup_async(db, to_number)
+    route, result = resolve_route(rows, routed, to_number, payload["Body"])
+    message_id = None
+    if route is not None:
+        message_id = (await _post_message(
+            db, route.group_id, route.group_name, route.from_number,
+            route.user_id, route.user_name, route.content
+        )).id
+        result = f"Message sent to {route.group_name} group"
+    if inbound_id is not None:
+        await db.execute(inbound_queue.processed_statement(
+            inbound_id, message_id, result
+        ))
+    await db.commit()
+    if message_id is not None:
+        notify_workers()
+    return result
+
+
+@sms_router.post("/webhook")
+async def handle_sms_webhook(
+    From: str = Form(...),
+    Body: str = Form(...),
+    To: str = Form(...),
+    MessageSid: Optional[str] = Form(None),
+    payload: dict = Depends(webhook_payload),
+    db: AsyncSession = Depends(get_async_db),
+):
+    mode = inbound_queue.WEBHOOK_MODE
+    with metrics.WEBHOOK_PROCESSING.labels(mode).time():
+        if inbound_queue.queued():
+            if await inbound_queue.enqueue_inbound_async(db, payload):
+                await db.commit()
+                inbound_queue.notify_workers()
+            return twiml_ack()
+
+        return {"message": await _receive_inline(db, payload)}
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import (
+    APIRouter, Depends, Header, HTTPException, Query, Response
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.db.database import get_db
-from app.models.models import Group, User, Message
+from app.db.database import get_db, get_read_db
+from app.models.models import Group, User, Message, user_groups
 from app.models.schemas import (
     GroupCreate, GroupResponse, MessageResponse, MessageCreate
 )
 from app.models.phone_pool import PhoneNumber, PhoneStatus
 from app.services.sms_service import (
-    send_welcome_sms, send_group_message, send_welcome_sms_with_phone
+    send_welcome_sms, send_welcome_sms_with_phone, format_group_message
+)
+from app.services.outbound_queue import (
+    enqueue_group_fanout, notify_workers
 )
+from app.services import events, membership_cache
 from datetime import datetime
 
 router = APIRouter()
@@ -25,11 +34,52 @@ def assign_phone_to_group(group_id: int, db: Session):
         available_phone.status = PhoneStatus.ASSIGNED
         available_phone.group_id = group_id
         available_phone.assigned_at = datetime.now()
+        events.notify(db, events.group_topic(group_id), "phone_assigned", {
+            "group_id": group_id,
+            "phone_number": available_phone.phone_number,
+        })
         db.commit()
         return available_phone
     return None
 
 
+def add_member(db: Session, group_id: int, user_id: int) -> bool:
+    """Add membership and bump member_count; False if already a member"""
+    inserted = db.execute(
+        pg_insert(user_groups)
+        .values(group_id=group_id, user_id=user_id)
+        .on_conflict_do_nothing(constraint="uq_user_groups_group_user")
+    ).rowcount
+    if inserted:
+        db.execute(
+            update(Group)
+            .where(Group.id == group_id)
+            .values(member_count=Group.member_count + 1)
+        )
+        events.notify(db, events.group_topic(group_id), "member_joined",
+                      {"group_id": group_id, "user_id": user_id})
+    return bool(inserted)
+
+
+def remove_member(db: Session, group_id: int, user_id: int) -> bool:
+    """Remove membership and drop member_count; False if not a member"""
+    deleted = db.execute(
+        delete(user_groups).where(
+            user_groups.c.group_id == group_id,
+            user_groups.c.user_id == user_id,
+        )
+    ).rowcount
+    if deleted:
+        db.execute(
+            update(Group)
+            .where(Group.id == group_id)
+            .values(member_count=Group.member_count - deleted)
+        )
+        events.notify(db, events.group_topic(group_id), "member_left",
+                      {"group_id": group_id, "user_id": user_id})
+    return bool(deleted)
+
+
 @router.post("/", response_model=GroupResponse)
 def create_group(group: GroupCreate, db: Session = Depends(get_db)):
     db_group = Group(name=group.name)
@@ -46,31 +96,63 @@ def create_group(group: GroupCreate, db: Session = Depends(get_db)):
     return db_group
 
 
-@router.get("/", response_model=List[GroupResponse])
-def get_groups(
-    search: Optional[str] = Query(None), db: Session = Depends(get_db)
-):
-    query = db.query(Group)
+def _escape_like(term: str) -> str:
+    return (term.replace("\\", "\\\\")
+            .replace("%", "\\%").replace("_", "\\_"))
+
+
+def group_listing_statement(search: Optional[str], limit: int, offset: int):
+    """SELECT for a page of groups, ranked by relevance when searching"""
+    stmt = select(
+        Group.id, Group.name, Group.created_at, Group.member_count
+    )
+    search = search.strip() if search else None
     if search:
-        query = query.filter(Group.name.contains(search))
+        # Case-insensitive substring match served by ix_groups_name_trgm;
+        # exact and prefix matches rank first, then trigram similarity
+        stmt = stmt.where(
+            Group.name.ilike(f"%{_escape_like(search)}%", escape="\\")
+        ).order_by(
+            case(
+                (func.lower(Group.name) == search.lower(), 0),
+                (Group.name.ilike(f"{_escape_like(search)}%",
+                                  escape="\\"), 1),
+                else_=2,
+            ),
+            func.similarity(Group.name, search).desc(),
+            Group.id,
+        )
+    else:
+        stmt = stmt.order_by(Group.id)
+    return stmt.offset(offset).limit(limit)
 
-    groups = query.all()
 
+def group_responses(rows) -> List[GroupResponse]:
     result = []
-    for group in groups:
+    for group in rows:
         group_dict = {
             "id": group.id,
             "name": group.name,
             "created_at": group.created_at,
-            "user_count": len(group.users)
+            "user_count": group.member_count
         }
         result.append(GroupResponse(**group_dict))
-
     return result
 
 
+@router.get("/", response_model=List[GroupResponse])
+def get_groups(
+    search: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db)
+):
+    groups = db.execute(group_listing_statement(search, limit, offset)).all()
+    return group_responses(groups)
+
+
 @router.get("/{group_id}", response_model=GroupResponse)
-def get_group(group_id: int, db: Session = Depends(get_db)):
+def get_group(group_id: int, db: Session = Depends(get_read_db)):
     group = db.query(Group).filter(Group.id == group_id).first()
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
@@ -79,7 +161,7 @@ def get_group(group_id: int, db: Session = Depends(get_db)):
         "id": group.id,
         "name": group.name,
         "created_at": group.created_at,
-        "user_count": len(group.users)
+        "user_count": group.member_count
     }
     return GroupResponse(**group_dict)
 
@@ -94,11 +176,11 @@ def join_group(group_id: int, user_id: int, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if user in group.users:
+    if not add_member(db, group_id, user_id):
         raise HTTPException(status_code=400, detail="User already in group")
-
-    group.users.append(user)
     db.commit()
+    # Other workers drop theirs on the member_joined event
+    membership_cache.group_members.invalidate({"group_id": group_id})
 
     # Create a system welcome message in the database
     welcome_message = Message(
@@ -107,6 +189,18 @@ def join_group(group_id: int, user_id: int, db: Session = Depends(get_db)):
         group_id=group_id
     )
     db.add(welcome_message)
+    db.flush()
+    events.notify(
+        db, events.group_topic(group_id), "message_created",
+        MessageResponse(
+            id=welcome_message.id,
+            content=welcome_message.content,
+            user_id=user_id,
+            group_id=group_id,
+            created_at=welcome_message.created_at,
+            user_name=user.name,
+        ).model_dump(mode="json"),
+    )
     db.commit()
 
     # Send welcome SMS using group's assigned phone number if available
@@ -131,20 +225,67 @@ def leave_group(group_id: int, user_id: int, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if user not in group.users:
+    if not remove_member(db, group_id, user_id):
         raise HTTPException(status_code=400, detail="User not in group")
-
-    group.users.remove(user)
     db.commit()
+    membership_cache.group_members.invalidate({"group_id": group_id})
 
     return {"message": f"User {user.name} left group {group.name}"}
 
 
-@router.get("/{group_id}/messages", response_model=List[MessageResponse])
-def get_group_messages(group_id: int, db: Session = Depends(get_db)):
-    messages = db.query(Message).filter(
-        Message.group_id == group_id
-    ).order_by(Message.created_at.desc()).limit(50).all()
+def _history_cache_headers(group_id: int, latest_id: int,
+                           limit: int) -> dict:
+    # no-cache lets browsers store the page but revalidate every poll; the
+    # page size is part of the tag since it changes the representation
+    return {
+        "ETag": f'W/"{group_id}-{latest_id}-{limit}"',
+        "Cache-Control": "no-cache",
+    }
+
+
+def latest_message_id_statement(group_id: int):
+    """Index-only lookup of a group's newest message id"""
+    return select(func.max(Message.id)).where(Message.group_id == group_id)
+
+
+def history_statement(group_id: int, before: Optional[int],
+                      after: Optional[int], limit: int):
+    """SELECT for one keyset page of history with author names joined.
+
+    Rows come back oldest-first when walking forward from ``after``.
+    """
+    stmt = select(
+        Message.id,
+        Message.content,
+        Message.user_id,
+        Message.group_id,
+        Message.created_at,
+        User.name.label("user_name"),
+    ).outerjoin(
+        User, User.id == Message.user_id
+    ).where(Message.group_id == group_id)
+    if before is not None:
+        stmt = stmt.where(Message.id < before)
+    if after is not None:
+        return stmt.where(Message.id > after).order_by(
+            Message.id.asc()
+        ).limit(limit)
+    return stmt.order_by(Message.id.desc()).limit(limit)
+
+
+def history_page(group_id: int, rows, response: Response,
+                 before: Optional[int], after: Optional[int],
+                 limit: int) -> List[MessageResponse]:
+    """Newest-first responses for a page, tagging the latest page's ETag"""
+    messages = list(rows)
+    if after is not None:
+        # Walked forward from the cursor, so flip to newest-first
+        messages.reverse()
+    elif before is None:
+        # This is the latest page, so its first row is the newest id
+        response.headers.update(_history_cache_headers(
+            group_id, messages[0].id if messages else 0, limit
+        ))
 
     result = []
     for msg in messages:
@@ -154,13 +295,77 @@ def get_group_messages(group_id: int, db: Session = Depends(get_db)):
             "user_id": msg.user_id,
             "group_id": msg.group_id,
             "created_at": msg.created_at,
-            "user_name": msg.user.name if msg.user else None
+            "user_name": msg.user_name
         }
         result.append(MessageResponse(**msg_dict))
-
     return result
 
 
+def delta_check(group_id: int, latest_id: int, response: Response,
+                since_id: Optional[int], before: Optional[int],
+                after: Optional[int], limit: int,
+                if_none_match: Optional[str]):
+    """Answer conditional / since_id polls from the newest message id.
+
+    Returns ``(early_response, after)``: a 304 or empty list when nothing
+    is new, otherwise None and the cursor to page forward from. Only the
+    latest page carries an ETag, so If-None-Match is ignored on a
+    request for an older or newer page.
+    """
+    headers = _history_cache_headers(group_id, latest_id, limit)
+    latest_page = before is None and after is None
+    if latest_page and if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers=headers), after
+    if since_id is not None:
+        response.headers.update(headers)
+        if since_id >= latest_id:
+            return [], after
+        after = since_id if after is None else max(after, since_id)
+    return None, after
+
+
+@router.get("/{group_id}/messages", response_model=List[MessageResponse])
+def get_group_messages(
+    group_id: int,
+    response: Response,
+    before: Optional[int] = Query(
+        None, description="Return messages older than this message id"
+    ),
+    after: Optional[int] = Query(
+        None, description="Return messages newer than this message id"
+    ),
+    since_id: Optional[int] = Query(
+        None, description="Delta sync: only messages after this id"
+    ),
+    limit: int = Query(50, ge=1, le=200),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
+    """Newest-first page of history using keyset cursors on message id.
+
+    Seeks on ix_messages_group_id_id, so any page costs O(limit) however
+    far back it is. Author names are joined in, so a page is one query.
+
+    The latest page carries an ETag naming the group's newest message id
+    and the page size.
+    Conditional (If-None-Match) and since_id polls first look that id up
+    with an index-only scan and answer 304 / an empty list without
+    running the history query when nothing is new.
+    """
+    if if_none_match is not None or since_id is not None:
+        latest_id = db.execute(
+            latest_message_id_statement(group_id)
+        ).scalar() or 0
+        early, after = delta_check(group_id, latest_id, response, since_id,
+                                   before, after, limit, if_none_match)
+        if early is not None:
+            return early
+
+    rows = db.execute(history_statement(group_id, before, after, limit))
+    return history_page(group_id, rows.all(), response, before,
+                        after, limit)
+
+
 @router.post("/{group_id}/messages", response_model=MessageResponse)
 def send_message(
     group_id: int, message: MessageCreate, db: Session = Depends(get_db)
@@ -173,7 +378,7 @@ def send_message(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if user not in group.users:
+    if not membership_cache.group_members.is_member(db, group_id, user.id):
         raise HTTPException(status_code=403, detail="User not in group")
 
     db_message = Message(
@@ -182,19 +387,21 @@ def send_message(
         group_id=group_id
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    db.flush()
 
-    # Send SMS to all other group members using group's assigned phone number
+    # Queue SMS to all other group members using group's assigned phone
+    # number; the worker pool delivers them after we respond
     group_phone = (group.phone_number_rel.phone_number
                    if group.phone_number_rel else None)
-    for member in group.users:
-        if member.id != user.id:
-            send_group_message(
-                member.phone_number, user.name, message.content,
-                group.name, group_phone
-            )
-
+    enqueue_group_fanout(
+        db,
+        group_id,
+        user.id,
+        format_group_message(user.name, message.content, group.name),
+        from_number=group_phone,
+        message_id=db_message.id,
+    )
+    # created_at came back from the INSERT's RETURNING at flush time
     msg_dict = {
         "id": db_message.id,
         "content": db_message.content,
@@ -203,4 +410,33 @@ def send_message(
         "created_at": db_message.created_at,
         "user_name": user.name
     }
-    return MessageResponse(**msg_dict)
+    message_response = MessageResponse(**msg_dict)
+    events.notify(
+        db, events.group_topic(group_id), "message_created",
+        message_response.model_dump(mode="json"),
+    )
+    db.commit()
+    notify_workers()
+    return message_response
+
+
+@router.get("/{group_id}/stream")
+def stream_group_events(group_id: int, db: Session = Depends(get_read_db)):
+    """Server-Sent Events stream of new messages in a group.
+
+    Each connection is a subscription on the in-process event bus, so
+    idle streams cost no queries; the session is released before the
+    stream starts.
+    """
+    if not db.query(Group.id).filter(Group.id == group_id).first():
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    return StreamingResponse(
+        events.sse_stream(events.group_topic(group_id)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.models.models import User
 from app.models.schemas import UserCreate, UserResponse
 from app.services.otp_service import create_otp_verification, verify_otp
@@ -97,13 +97,13 @@ def create_user_legacy(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=List[UserResponse])
-def get_users(db: Session = Depends(get_db)):
+def get_users(db: Session = Depends(get_read_db)):
     users = db.query(User).all()
     return users
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, db: Session = Depends(get_read_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -111,7 +111,7 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/phone/{phone_number}", response_model=UserResponse)
-def get_user_by_phone(phone_number: str, db: Session = Depends(get_db)):
+def get_user_by_phone(phone_number: str, db: Session = Depends(get_read_db)):
     user = db.query(User).filter(User.phone_number == phone_number).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -119,7 +119,7 @@ def get_user_by_phone(phone_number: str, db: Session = Depends(get_db)):
 
 
 @router.get("/{user_id}/groups", response_model=List[int])
-def get_user_groups(user_id: int, db: Session = Depends(get_db)):
+def get_user_groups(user_id: int, db: Session = Depends(get_read_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
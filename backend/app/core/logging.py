@@ -1,6 +1,28 @@
+"""
+Logging setup.
+
+The root logger only has a QueueHandler, so a log call in a request
+thread just enqueues the record. A QueueListener thread does the actual
+writing: to stdout and to logs/app.log, rotated at LOG_MAX_BYTES with
+LOG_BACKUP_COUNT old files kept. LOG_FORMAT=json writes one JSON object
+per line instead of text.
+
+Rotation renames the file, which is only safe with one writer. When
+several uvicorn workers run (PROMETHEUS_MULTIPROC_DIR is set, or
+WEB_CONCURRENCY > 1), each writes and rotates its own logs/app.<pid>.log.
+
+Both outputs write UTF-8 and backslash-escape whatever they still cannot
+encode, since an encoding error on the writer thread would lose the
+record rather than reach the caller.
+"""
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import atexit
+import copy
+import json
 import logging
-import sys
 import os
+import queue
+import sys
 from pathlib import Path
 
 # Create logs directory
@@ -9,47 +31,101 @@ log_dir.mkdir(exist_ok=True)
 
 # Get log level from environment
 log_level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper())
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
 
-# Configure logging with proper encoding
-logging.basicConfig(
-    level=log_level,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        # Use UTF-8 encoding for console output
-        logging.StreamHandler(sys.stdout),
-        # Use UTF-8 encoding for file output
-        logging.FileHandler(log_dir / "app.log", encoding="utf-8"),
-    ],
-)
 
-# Set console handler encoding to UTF-8 if possible
-for handler in logging.root.handlers:
-    if (isinstance(handler, logging.StreamHandler) and
-            handler.stream == sys.stdout):
-        # Try to set UTF-8 encoding for Windows
-        try:
-            handler.stream.reconfigure(encoding="utf-8")
-        except (AttributeError, OSError):
-            # If reconfigure fails (older Python or system limitation),
-            # we'll fall back to ASCII-safe logging
-            pass
+def log_file_name() -> str:
+    """``app.log``, or ``app.<pid>.log`` when several workers log"""
+    multiprocess = (os.getenv("PROMETHEUS_MULTIPROC_DIR")
+                    or int(os.getenv("WEB_CONCURRENCY", "1")) > 1)
+    return f"app.{os.getpid()}.log" if multiprocess else "app.log"
 
-logger = logging.getLogger(__name__)
 
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogQueueHandler(QueueHandler):
+    """Enqueues records with their message rendered but unformatted.
+
+    Arguments and tracebacks are resolved here, while they are still
+    valid; the layout (text or JSON) is left to the writer thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
 
-# Helper function for Windows-safe logging
-def safe_log(level, message, *args, **kwargs):
-    """Log message with fallback for encoding issues"""
+
+def _formatter() -> logging.Formatter:
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def console_handler_for(stream) -> logging.StreamHandler:
+    """A handler for ``stream`` that cannot fail on emoji and the like"""
     try:
-        getattr(logger, level)(message, *args, **kwargs)
-    except UnicodeEncodeError:
-        # Replace emoji/unicode with ASCII equivalents
-        safe_message = message.encode("ascii", errors="replace").decode(
-            "ascii")
-        getattr(logger, level)(safe_message, *args, **kwargs)
-
-
-# Example usage in your code:
-# from app.core.logging import logger, safe_log
-# logger.debug("Debug message")
-# safe_log("info", "Message with emoji 🚀")
+        # UTF-8 where the console defaults to something else (Windows)
+        stream.reconfigure(encoding="utf-8", errors="backslashreplace")
+    except (AttributeError, OSError):
+        # Not a text stream that can be reconfigured; left as it is
+        pass
+    return logging.StreamHandler(stream)
+
+
+console_handler = console_handler_for(sys.stdout)
+file_handler = RotatingFileHandler(
+    log_dir / log_file_name(), maxBytes=LOG_MAX_BYTES,
+    backupCount=LOG_BACKUP_COUNT, encoding="utf-8",
+    errors="backslashreplace",
+)
+for handler in (console_handler, file_handler):
+    handler.setFormatter(_formatter())
+
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+listener = QueueListener(log_queue, console_handler, file_handler,
+                         respect_handler_level=True)
+
+logging.basicConfig(level=log_level, handlers=[LogQueueHandler(log_queue)])
+listener.start()
+_listener_running = True
+
+
+def stop_logging():
+    """Write out whatever is still queued and stop the writer thread"""
+    global _listener_running
+    if _listener_running:
+        _listener_running = False
+        listener.stop()
+
+
+atexit.register(stop_logging)
+
+logger = logging.getLogger(__name__)
@@ -0,0 +1,191 @@
+"""
+Prometheus metrics, served at GET /metrics.
+
+Request latency is recorded per route template by MetricsMiddleware (a
+pure ASGI middleware, like RequestLoggingMiddleware). The hot paths record
+webhook processing time, fan-out size and duration, Twilio API latency
+and errors, and OTP sends; app/db/query_stats.py records SQL statements
+and time per request. Connection pool figures are read from the engines at
+scrape time.
+
+Metrics live in process memory, so with several uvicorn workers set
+PROMETHEUS_MULTIPROC_DIR to an empty directory shared by all of them
+(cleared before the server starts). Every worker then writes its samples
+there and a scrape of any worker aggregates them all; pool figures are
+still those of the worker that answered. The same setting makes each
+worker log to its own file (app/core/logging.py).
+"""
+from contextlib import contextmanager
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"],
+)
+WEBHOOK_PROCESSING = Histogram(
+    "sms_webhook_processing_seconds",
+    "Time to handle one inbound SMS: in the request (queue, inline) or "
+    "in an inbound worker (worker)",
+    ["mode"],
+)
+FANOUT_RECIPIENTS = Histogram(
+    "sms_fanout_recipients", "Recipients queued per group message",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+FANOUT_DURATION = Histogram(
+    "sms_fanout_seconds", "Time to queue one group fan-out",
+)
+TWILIO_LATENCY = Histogram(
+    "twilio_request_duration_seconds", "Twilio Messages API call latency",
+    ["outcome"],
+)
+TWILIO_ERRORS = Counter(
+    "twilio_errors", "Failed Twilio Messages API calls by HTTP status",
+    ["status"],
+)
+OTP_SENT = Counter(
+    "otp_sms", "OTP verification SMS sent", ["outcome"],
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request", "SQL statements issued per request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 250),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds_per_request", "Time spent in SQL per request",
+    ["route"],
+)
+SLOW_QUERIES = Counter(
+    "db_slow_queries", "Statements slower than DB_SLOW_QUERY_MS",
+    ["route"],
+)
+
+
+def route_label(scope) -> str:
+    """Matched route template; unmatched paths share one label to keep
+    cardinality bounded"""
+    return getattr(scope.get("route"), "path", "<unmatched>")
+
+
+@contextmanager
+def twilio_call():
+    """Time one Twilio API call and count it if it fails"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception as e:
+        outcome = "error"
+        TWILIO_ERRORS.labels(str(getattr(e, "status", None) or "none")).inc()
+        raise
+    finally:
+        TWILIO_LATENCY.labels(outcome).observe(time.perf_counter() - start)
+
+
+class PoolCollector:
+    """Connection pool occupancy and checkout waits of every engine"""
+
+    GAUGES = {
+        "size": "Configured pool size",
+        "checked_out": "Connections in use",
+        "checked_in": "Idle connections in the pool",
+        "overflow": "Connections open beyond the pool size",
+    }
+    COUNTERS = {
+        "checkouts": "Connection checkouts",
+        "timeouts": "Checkouts that timed out waiting",
+        "wait_seconds": "Time spent waiting for a connection",
+    }
+
+    def _families(self):
+        gauges = {
+            key: GaugeMetricFamily(f"db_pool_{key}", doc, labels=["engine"])
+            for key, doc in self.GAUGES.items()
+        }
+        counters = {
+            key: CounterMetricFamily(f"db_pool_{key}", doc,
+                                     labels=["engine"])
+            for key, doc in self.COUNTERS.items()
+        }
+        return gauges, counters
+
+    def describe(self):
+        # Lets the registry learn the names without touching the engines
+        gauges, counters = self._families()
+        yield from gauges.values()
+        yield from counters.values()
+
+    def collect(self):
+        from app.db import database
+        from app.db.pool import pool_metrics
+
+        gauges, counters = self._families()
+        for name, pool in database.engine_pools().items():
+            stats = pool_metrics(pool)
+            for key, family in gauges.items():
+                if key in stats:
+                    family.add_metric([name], stats[key])
+            for key, family in counters.items():
+                value = stats.get(
+                    "wait_seconds_total" if key == "wait_seconds" else key
+                )
+                if value is not None:
+                    family.add_metric([name], value)
+        yield from gauges.values()
+        yield from counters.values()
+
+
+# Read by prometheus_client itself when it is imported
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+
+def render():
+    """``(body, content_type)`` for the /metrics endpoint"""
+    if not MULTIPROC_DIR:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(pool_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop this worker's live samples from PROMETHEUS_MULTIPROC_DIR"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """Records request latency labelled with the matched route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(
+                scope["method"], route_label(scope), str(status)
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,126 @@
+"""
+Request logging as a pure ASGI middleware.
+
+Every request gets an ``X-Process-Time`` header. Its [IN]/[OUT] log lines
+are written for a sample of requests, chosen per path prefix
+(REQUEST_LOG_SAMPLE_RATE, REQUEST_LOG_ROUTE_SAMPLE_RATES); server errors
+are always logged. Query params, headers and the request body are only
+collected when DEBUG logging is enabled, and the body is then teed from
+the ASGI receive channel rather than buffered up front.
+"""
+from typing import List, Tuple
+import json
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1.0"))
+# e.g. "/api/sms/webhook=0.05,/api/groups=0.5"; longest prefix wins
+ROUTE_SAMPLE_RATES = os.getenv("REQUEST_LOG_ROUTE_SAMPLE_RATES", "")
+
+SENSITIVE_HEADERS = {"authorization", "cookie", "x-api-key"}
+SENSITIVE_FIELDS = {"password", "otp_code", "token"}
+BODY_METHODS = {"POST", "PUT", "PATCH"}
+BODY_LOG_LIMIT = 200
+
+
+def parse_sample_rates(spec: str) -> List[Tuple[str, float]]:
+    """``"/prefix=rate,..."`` -> [(prefix, rate)], longest prefix first"""
+    rates = []
+    for item in spec.split(","):
+        prefix, sep, rate = item.strip().partition("=")
+        if sep and prefix:
+            rates.append((prefix, float(rate)))
+    return sorted(rates, key=lambda item: len(item[0]), reverse=True)
+
+
+def format_body(body: bytes) -> str:
+    """Request body for the debug log, sensitive JSON fields masked"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body[:BODY_LOG_LIMIT].decode("utf-8", errors="replace")
+    if isinstance(data, dict):
+        data = {
+            k: "***" if k.lower() in SENSITIVE_FIELDS else v
+            for k, v in data.items()
+        }
+    return json.dumps(data)[:BODY_LOG_LIMIT]
+
+
+class RequestLoggingMiddleware:
+    """Times every request and logs a sample of them"""
+
+    def __init__(self, app, sample_rate: float = SAMPLE_RATE,
+                 route_rates: str = ROUTE_SAMPLE_RATES, rng=random.random):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.route_rates = parse_sample_rates(route_rates)
+        self.rng = rng
+
+    def rate_for(self, path: str) -> float:
+        for prefix, rate in self.route_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        sampled = self.rng() < self.rate_for(path)
+        debug = sampled and logger.isEnabledFor(logging.DEBUG)
+        if sampled:
+            client = scope.get("client")
+            logger.info("[IN] %s %s - Client: %s", method, path,
+                        client[0] if client else "-")
+        if debug:
+            self._log_details(scope)
+
+        body = [] if debug and method in BODY_METHODS else None
+        status = 500
+
+        async def receive_teed():
+            message = await receive()
+            if message["type"] == "http.request":
+                body.append(message.get("body", b""))
+            return message
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - start
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-process-time", str(elapsed).encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive if body is None else receive_teed,
+                           send_timed)
+        finally:
+            if sampled or status >= 500:
+                logger.log(
+                    logging.ERROR if status >= 500 else logging.INFO,
+                    "[OUT] %s %s - Status: %s - Time: %.3fs",
+                    method, path, status, time.perf_counter() - start,
+                )
+            if body:
+                logger.debug("   Body: %s", format_body(b"".join(body)))
+
+    @staticmethod
+    def _log_details(scope):
+        if scope.get("query_string"):
+            logger.debug("   Query params: %s",
+                         scope["query_string"].decode("latin-1"))
+        logger.debug("   Headers: %s", {
+            k.decode("latin-1"): v.decode("latin-1")
+            for k, v in scope["headers"]
+            if k.decode("latin-1").lower() not in SENSITIVE_HEADERS
+        })
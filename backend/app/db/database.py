@@ -1,11 +1,20 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+import logging
 import os
+import time
 from dotenv import load_dotenv
+from app.db import query_stats
+from app.db.pool import engine_options
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # PostgreSQL database configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL or not DATABASE_URL.startswith("postgresql://"):
@@ -13,15 +22,207 @@ if not DATABASE_URL or not DATABASE_URL.startswith("postgresql://"):
         "DATABASE_URL must be set to a PostgreSQL connection string"
     )
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Pool sizing, PgBouncer mode and metrics: see app/db/pool.py
+engine = create_engine(DATABASE_URL, **engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional asyncio engine (asyncpg) behind the async hot endpoints in
+# app/api/async_endpoints.py, enabled with DB_ASYNC=true
+ASYNC_DB = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+
+def _async_url(url: str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+def _create_async_engine(url: str):
+    try:
+        return create_async_engine(url, **engine_options(async_driver=True))
+    except ImportError as e:
+        raise RuntimeError("DB_ASYNC=true requires asyncpg") from e
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL",
+                               _async_url(DATABASE_URL))
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DB:
+    async_engine = _create_async_engine(ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+# Optional streaming replica for the read-only endpoints (history, search,
+# user lookups); unset means everything reads from the primary
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+# After a client writes, its reads stay on the primary this long so it
+# sees its own changes despite replication lag
+READ_YOUR_WRITES_SECONDS = float(
+    os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5")
+)
+# Reads fall back to the primary this long after the replica fails
+REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+replica_engine = None
+ReplicaSessionLocal = None
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+if REPLICA_DATABASE_URL:
+    replica_engine = create_engine(REPLICA_DATABASE_URL, **engine_options())
+    ReplicaSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=replica_engine
+    )
+    if ASYNC_DB:
+        async_replica_engine = _create_async_engine(
+            _async_url(REPLICA_DATABASE_URL)
+        )
+        AsyncReplicaSessionLocal = async_sessionmaker(
+            async_replica_engine, autoflush=False, expire_on_commit=False
+        )
+
 Base = declarative_base()
 
 
+def engine_pools():
+    """Connection pool of every configured engine, by role"""
+    engines = {
+        "primary": engine,
+        "async": async_engine,
+        "replica": replica_engine,
+        "async_replica": async_replica_engine,
+    }
+    return {
+        name: db_engine.pool for name, db_engine in engines.items()
+        if db_engine is not None
+    }
+
+
+# Per-request query counts and slow-query logging
+for _engine in (engine, async_engine, replica_engine, async_replica_engine):
+    if _engine is not None:
+        query_stats.instrument(_engine)
+
+
+class ReplicaHealth:
+    """Takes the replica out of rotation for a while after it fails"""
+
+    def __init__(self, retry_seconds: float = REPLICA_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self.down_until = 0.0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, reason):
+        logger.warning("Read replica unavailable, using primary for "
+                       "%.0fs: %s", self.retry_seconds, reason)
+        self.down_until = time.monotonic() + self.retry_seconds
+
+
+replica_health = ReplicaHealth()
+
+
+def _on_replica_error(context):
+    if context.is_disconnect:
+        replica_health.mark_down(context.original_exception)
+
+
+for _engine in (replica_engine, async_replica_engine):
+    if _engine is not None:
+        event.listen(getattr(_engine, "sync_engine", _engine),
+                     "handle_error", _on_replica_error)
+
+
+def reads_from_replica(request: Request) -> bool:
+    """Whether this request's reads may go to the replica"""
+    if replica_engine is None or not replica_health.available():
+        return False
+    try:
+        primary_until = float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+    except ValueError:
+        primary_until = 0
+    return primary_until <= time.time()
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for a while after it writes.
+
+    Successful non-GET requests get a short-lived cookie that
+    ``get_read_db`` honours, so the pin follows the client across
+    uvicorn workers.
+    """
+
+    def __init__(self, app, window: float = READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http"
+                or scope["method"] in ("GET", "HEAD", "OPTIONS")):
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if (message["type"] == "http.response.start"
+                    and message["status"] < 400):
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}={time.time() + self.window:.3f}; "
+                    f"Max-Age={int(self.window) + 1}; Path=/; HttpOnly; "
+                    f"SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode())
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: the replica when configured,
+    healthy and the client has not just written, else the primary"""
+    db = None
+    if reads_from_replica(request):
+        db = ReplicaSessionLocal()
+        try:
+            # Check out now so an unreachable replica falls back here
+            # instead of failing the request
+            db.connection()
+        except DBAPIError as e:
+            db.close()
+            replica_health.mark_down(e)
+            db = None
+    if db is None:
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request):
+    """``get_read_db`` for the async endpoints"""
+    if AsyncReplicaSessionLocal is not None and reads_from_replica(request):
+        async with AsyncReplicaSessionLocal() as db:
+            try:
+                await db.connection()
+            except (DBAPIError, OSError) as e:
+                replica_health.mark_down(e)
+            else:
+                yield db
+                return
+    async with AsyncSessionLocal() as db:
+        yield db
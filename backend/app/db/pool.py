@@ -0,0 +1,141 @@
+"""
+Connection pool configuration and metrics.
+
+Pool sizing comes from the environment so it can be matched to the real
+concurrency of a deployment: each uvicorn worker needs roughly one
+connection per in-flight request (threadpool size, 40 by default) plus
+one per outbound queue thread and one for the event listener.
+
+With DB_PGBOUNCER=true the app expects PgBouncer in transaction pooling
+mode in front of Postgres: the app keeps no pool of its own (PgBouncer is
+the pool) and asyncpg's prepared statement caches are disabled. The
+LISTEN connection of the event bus needs a session-level connection, so
+point EVENTS_DATABASE_URL at Postgres directly in that mode.
+"""
+from typing import Any, Dict
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a request waits for a connection before QueuePool gives up
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections older than this are replaced on checkout (-1 disables)
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# A SELECT 1 round trip on every checkout; recycle usually suffices
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+class PoolStats:
+    """Checkout wait times and timeouts for one pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+class _TimedCheckout:
+    """Times how long each checkout waits for a free connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # Keep counting across dispose()/recreate
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def engine_options(async_driver: bool = False) -> Dict[str, Any]:
+    """Keyword arguments for create_engine / create_async_engine"""
+    if PGBOUNCER:
+        options: Dict[str, Any] = {"poolclass": NullPool}
+        if async_driver:
+            # Transaction pooling hands each transaction to any server
+            # connection, so statements prepared on one are unknown on
+            # the next
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+            }
+        return options
+    return {
+        "poolclass": (InstrumentedAsyncQueuePool if async_driver
+                      else InstrumentedQueuePool),
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+def pool_metrics(pool) -> Dict[str, Any]:
+    """Current occupancy plus cumulative wait statistics of ``pool``"""
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    metrics = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # Connections open beyond pool_size (negative while the pool is
+        # still filling up)
+        "overflow": pool.overflow(),
+    }
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        metrics.update(stats.snapshot())
+    return metrics
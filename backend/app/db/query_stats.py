@@ -0,0 +1,123 @@
+"""
+Per-request SQL statistics.
+
+``instrument(engine)`` times every statement an engine executes. Within
+a request (QueryStatsMiddleware) the count and total DB time accumulate on
+the request's QueryStats; contextvars follow sync endpoints into the
+threadpool. When the response is done they are observed in the
+``db_queries_per_request`` and ``db_query_seconds_per_request``
+histograms per route. Statements slower than DB_SLOW_QUERY_MS are logged
+with the route that issued them. With DB_QUERY_DEBUG=true every response
+also carries ``X-DB-Query-Count`` and ``X-DB-Query-Time`` headers.
+"""
+from contextvars import ContextVar
+from typing import Optional
+import logging
+import os
+import time
+
+from sqlalchemy import event
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_SECONDS = float(os.getenv("DB_SLOW_QUERY_MS", "200")) / 1000
+DEBUG_HEADERS = os.getenv("DB_QUERY_DEBUG", "false").lower() == "true"
+STATEMENT_LOG_LIMIT = 1000
+
+
+class QueryStats:
+    """Queries issued while handling one request"""
+
+    __slots__ = ("scope", "count", "seconds")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+def current() -> Optional[QueryStats]:
+    """Stats of the request being handled, None outside a request"""
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        if stats is not None:
+            route = metrics.route_label(stats.scope)
+            where = f"{stats.scope['method']} {route}"
+        else:
+            # Outbound/inbound workers, startup warm-up
+            route = where = "background"
+        metrics.SLOW_QUERIES.labels(route).inc()
+        logger.warning(
+            "Slow query (%.0f ms) in %s: %s", elapsed * 1000, where,
+            " ".join(statement.split())[:STATEMENT_LOG_LIMIT],
+        )
+
+
+def _on_error(context):
+    # after_cursor_execute does not run for a failed statement
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument(engine):
+    """Time the statements of ``engine`` (sync or async)"""
+    engine = getattr(engine, "sync_engine", engine)
+    if event.contains(engine, "before_cursor_execute",
+                      _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _on_error)
+
+
+class QueryStatsMiddleware:
+    """Collects QueryStats for each request and reports them"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats(scope)
+        token = _current.set(stats)
+
+        async def send_with_stats(message):
+            if DEBUG_HEADERS and message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-query-time",
+                     f"{stats.seconds * 1000:.1f}ms".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
+            route = metrics.route_label(scope)
+            metrics.DB_QUERIES.labels(route).observe(stats.count)
+            metrics.DB_QUERY_SECONDS.labels(route).observe(stats.seconds)
@@ -1,87 +1,33 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import users, groups, sms, admin
-import time
-import json
+from app.api import users, groups, sms, admin, async_endpoints
+from app.db import database, query_stats
+from app.services import (
+    events, inbound_queue, outbound_queue, routing_cache
+)
 import os
 
 # Import logging configuration to initialize it
-from app.core.logging import logger, safe_log
+from app.core.logging import logger
+from app.core.request_logging import RequestLoggingMiddleware
+from app.core import metrics
 
 # Note: Database tables are now managed via Alembic migrations
 # Run 'python db_manager.py migrate' to create/update tables
 
 app = FastAPI(title="Group SMS Chat API")
 
-# Log application startup (Windows-safe)
-safe_log("info", "Starting Group SMS Chat API...")
-
-
-# Request logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
+# Log application startup
+logger.info("Starting Group SMS Chat API...")
 
-    # Log incoming request
-    logger.info(
-        f"[IN] {request.method} {request.url.path} - "
-        f"Client: {request.client.host}"
-    )
 
-    # Log query parameters if any
-    if request.query_params:
-        logger.debug(f"   Query params: {dict(request.query_params)}")
-
-    # Log headers (excluding sensitive ones)
-    headers_to_log = {
-        k: v
-        for k, v in request.headers.items()
-        if k.lower() not in ["authorization", "cookie", "x-api-key"]
-    }
-    logger.debug(f"   Headers: {headers_to_log}")
-
-    # For POST/PUT requests, try to log body (be careful with sensitive data)
-    if request.method in ["POST", "PUT", "PATCH"]:
-        try:
-            body = await request.body()
-            if body:
-                # Try to parse as JSON for better formatting
-                try:
-                    body_json = json.loads(body.decode())
-                    # Mask sensitive fields
-                    if isinstance(body_json, dict):
-                        masked_body = {
-                            k: "***"
-                            if k.lower() in ["password", "otp_code", "token"]
-                            else v
-                            for k, v in body_json.items()
-                        }
-                        logger.debug(
-                            f"   Body: {json.dumps(masked_body, indent=2)}")
-                    else:
-                        logger.debug(f"   Body: {body_json}")
-                except json.JSONDecodeError:
-                    logger.debug(f"   Body (raw): {body.decode()[:200]}...")
-        except Exception as e:
-            logger.debug(f"   Could not read body: {e}")
-
-    # Process the request
-    response = await call_next(request)
-
-    # Calculate processing time
-    process_time = time.time() - start_time
-
-    # Log response
-    logger.info(
-        f"[OUT] {request.method} {request.url.path} - "
-        f"Status: {response.status_code} - Time: {process_time:.3f}s"
-    )
-
-    # Add processing time to response headers
-    response.headers["X-Process-Time"] = str(process_time)
-
-    return response
+# Request logging (innermost, so it times only the app itself)
+app.add_middleware(RequestLoggingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(query_stats.QueryStatsMiddleware)
 
+if database.replica_engine is not None:
+    app.add_middleware(database.ReadYourWritesMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -91,12 +37,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if database.ASYNC_DB:
+    # The async hot paths shadow their sync twins, so they go first
+    app.include_router(async_endpoints.groups_router, prefix="/api/groups",
+                       tags=["groups"])
+    app.include_router(async_endpoints.sms_router, prefix="/api/sms",
+                       tags=["sms"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(groups.router, prefix="/api/groups", tags=["groups"])
 app.include_router(sms.router, prefix="/api/sms", tags=["sms"])
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
-safe_log("info", "All routers registered successfully")
+logger.info("All routers registered successfully")
+
+
+@app.on_event("startup")
+def start_background_workers():
+    outbound_queue.start_workers()
+    inbound_queue.start_workers()
+
+
+@app.on_event("startup")
+async def start_event_listener():
+    await events.start_listener()
+
+
+@app.on_event("startup")
+def warm_caches():
+    routing_cache.warm()
+
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    inbound_queue.stop_workers()
+    outbound_queue.stop_workers()
+
+
+@app.on_event("shutdown")
+def release_metrics():
+    metrics.mark_process_dead()
+
+
+@app.on_event("shutdown")
+async def stop_event_listener():
+    await events.stop_listener()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    for async_engine in (database.async_engine,
+                         database.async_replica_engine):
+        if async_engine is not None:
+            await async_engine.dispose()
 
 
 @app.get("/")
@@ -105,6 +97,13 @@ def read_root():
     return {"message": "Group SMS Chat API"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/api/health")
 def health_check():
     """Health check endpoint that also returns config info"""
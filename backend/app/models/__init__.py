@@ -1,3 +1,5 @@
 # Import all models to ensure they're registered with SQLAlchemy
 from .models import User, Group, Message, user_groups  # noqa: F401
 from .phone_pool import PhoneNumber, PhoneStatus, OTPVerification  # noqa: F401
+from .outbound import OutboundMessage, OutboundStatus  # noqa: F401
+from .inbound import InboundMessage, InboundStatus  # noqa: F401
@@ -0,0 +1,50 @@
+from sqlalchemy import (
+    JSON, Column, Integer, String, DateTime, ForeignKey, Enum, Index, text
+)
+from sqlalchemy.sql import func
+from app.db.database import Base
+import enum
+
+
+class InboundStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    PROCESSED = "PROCESSED"
+    FAILED = "FAILED"
+
+
+class InboundMessage(Base):
+    """One Twilio SMS webhook, stored as received and routed by a worker"""
+    __tablename__ = "inbound_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Twilio's id for the SMS; retried webhooks repeat it
+    message_sid = Column(String(34), nullable=True)
+    from_number = Column(String(20), nullable=False)
+    to_number = Column(String(20), nullable=False)
+    body = Column(String(1600), nullable=False)
+    # Every form field Twilio posted, verbatim
+    payload = Column(JSON, nullable=True)
+    status = Column(Enum(InboundStatus), nullable=False,
+                    default=InboundStatus.PENDING,
+                    server_default=InboundStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0,
+                      server_default="0")
+    # What the inline webhook would have answered, e.g. the routing error
+    result = Column(String(500), nullable=True)
+    last_error = Column(String(500), nullable=True)
+    message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    available_at = Column(DateTime(timezone=True), nullable=False,
+                          server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_inbound_messages_message_sid", "message_sid",
+              unique=True),
+        Index(
+            "ix_inbound_messages_pending", "available_at", "id",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
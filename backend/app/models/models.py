@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table
+from sqlalchemy import (
+    DDL, Column, Integer, String, DateTime, ForeignKey, Index, Table,
+    UniqueConstraint, event
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -6,8 +9,10 @@ from app.db.database import Base
 user_groups = Table(
     'user_groups',
     Base.metadata,
-    Column('user_id', Integer, ForeignKey('users.id')),
-    Column('group_id', Integer, ForeignKey('groups.id'))
+    Column('user_id', Integer, ForeignKey('users.id'), index=True),
+    Column('group_id', Integer, ForeignKey('groups.id')),
+    # Leading group_id also serves member lookups and counts per group
+    UniqueConstraint('group_id', 'user_id', name='uq_user_groups_group_user')
 )
 
 
@@ -30,6 +35,10 @@ class Group(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
+    # Maintained by join_group/leave_group; repair with
+    # `python db_manager.py reconcile-counts`
+    member_count = Column(Integer, nullable=False, default=0,
+                          server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     users = relationship("User", secondary=user_groups,
@@ -39,6 +48,19 @@ class Group(Base):
     phone_number_rel = relationship("PhoneNumber", back_populates="group",
                                     uselist=False)
 
+    __table_args__ = (
+        # Trigram index so ILIKE '%term%' searches avoid a sequential scan
+        Index("ix_groups_name_trgm", "name", postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}),
+    )
+
+
+# gin_trgm_ops needs the extension before the groups table is created
+event.listen(
+    Group.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -51,3 +73,8 @@ class Message(Base):
 
     user = relationship("User", back_populates="messages")
     group = relationship("Group", back_populates="messages")
+
+    __table_args__ = (
+        # Keyset pagination of a group's history seeks on (group_id, id)
+        Index("ix_messages_group_id_id", "group_id", "id"),
+    )
@@ -0,0 +1,46 @@
+from sqlalchemy import (
+    Column, Integer, String, DateTime, ForeignKey, Enum, Index, text
+)
+from sqlalchemy.sql import func
+from app.db.database import Base
+import enum
+
+
+class OutboundStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    SENDING = "SENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+
+class OutboundMessage(Base):
+    """One queued SMS to a single recipient, drained by the worker pool"""
+    __tablename__ = "outbound_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    recipient_user_id = Column(Integer, ForeignKey("users.id"),
+                               nullable=True)
+    to_number = Column(String(20), nullable=False)
+    from_number = Column(String(20), nullable=True)
+    body = Column(String(1600), nullable=False)
+    status = Column(Enum(OutboundStatus), nullable=False,
+                    default=OutboundStatus.PENDING,
+                    server_default=OutboundStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0,
+                      server_default="0")
+    last_error = Column(String(500), nullable=True)
+    twilio_sid = Column(String(50), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    available_at = Column(DateTime(timezone=True), nullable=False,
+                          server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Workers only ever scan pending rows, so keep the claim index small
+        Index(
+            "ix_outbound_messages_pending", "available_at", "id",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
@@ -0,0 +1,314 @@
+"""
+Pub/sub for live updates and cross-worker cache invalidation.
+
+Endpoints call ``notify(db, topic, event, data)`` inside their transaction
+with events such as ``message_created``, ``member_joined``,
+``member_left`` and ``phone_assigned`` on topics like ``group:42``.
+
+With EVENTS_BACKEND=postgres (the default) the event is sent with
+``pg_notify``, so it is delivered only if the transaction commits and
+reaches every uvicorn worker: each worker keeps one dedicated LISTEN
+connection (``PgEventListener``) on its event loop and republishes what it
+hears to its local ``bus``. With EVENTS_BACKEND=local (single process,
+tests) events go straight to the local bus after commit.
+
+The local bus hands events to async subscribers (one per SSE stream) and
+to sync handlers registered with ``bus.add_handler`` (e.g. caches).
+Publishing is thread-safe, so sync endpoints running in the threadpool can
+reach subscribers living on the event loop.
+"""
+from typing import Any, Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import logging
+import os
+import threading
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import event as sa_event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# "postgres" (LISTEN/NOTIFY, works across workers) or "local"
+BACKEND = os.getenv("EVENTS_BACKEND", "postgres").lower()
+CHANNEL = os.getenv("EVENTS_CHANNEL", "sms_chat_events")
+RECONNECT_SECONDS = float(os.getenv("EVENTS_RECONNECT_SECONDS", "2"))
+# pg_notify rejects payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+# Events buffered per subscriber before a slow client is dropped
+SUBSCRIBER_BUFFER = int(os.getenv("EVENT_SUBSCRIBER_BUFFER", "100"))
+# Comment line sent on idle streams so proxies keep them open
+STREAM_HEARTBEAT_SECONDS = float(
+    os.getenv("EVENT_STREAM_HEARTBEAT_SECONDS", "15")
+)
+
+
+def group_topic(group_id: int) -> str:
+    return f"group:{group_id}"
+
+
+class Subscription:
+    """One subscriber's bounded queue of events on the event loop"""
+
+    def __init__(self, bus: "EventBus", topic: str,
+                 maxsize: int = SUBSCRIBER_BUFFER):
+        self.bus = bus
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def _put(self, event: Dict[str, Any]):
+        # Runs on the subscriber's loop
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind: end the stream, the client resyncs on
+            # reconnect instead of us buffering without bound
+            logger.warning("Dropping slow subscriber on %s", self.topic)
+            self.close()
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None):
+        """Next event, ``None`` once closed; TimeoutError if idle"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        self.closed = True
+
+
+class EventBus:
+    """Topic -> subscribers registry, plus per-event sync handlers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+
+    def add_handler(self, event: str,
+                    handler: Callable[[Dict[str, Any]], None]):
+        """Call ``handler(data)`` for every ``event`` this process sees"""
+        with self._lock:
+            self._handlers.setdefault(event, []).append(handler)
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Subscribe from inside the running event loop"""
+        subscription = Subscription(self, topic)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        with self._lock:
+            if topic is not None:
+                return len(self._subscribers.get(topic, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, topic: str, event: str, data: Dict[str, Any]):
+        """Deliver ``event`` to this process's subscribers of ``topic``"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+            handlers = list(self._handlers.get(event, ()))
+        for handler in handlers:
+            try:
+                handler(data)
+            except Exception:
+                logger.exception("Event handler failed for %s", event)
+        payload = {"event": event, "data": data}
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription._put, payload
+                )
+            except RuntimeError:
+                # Loop already closed (e.g. during shutdown)
+                self.unsubscribe(subscription)
+
+
+bus = EventBus()
+
+
+def _encode(topic: str, event: str, data: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"topic": topic, "event": event, "data": data}, default=str
+    )
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        # Too big for NOTIFY: send the ids only, clients refetch
+        slim = {k: data[k] for k in ("id", "group_id", "user_id")
+                if k in data}
+        payload = json.dumps(
+            {"topic": topic, "event": event, "data": slim}, default=str
+        )
+    return payload
+
+
+def _notify_statement(topic: str, event: str, data: Dict[str, Any]):
+    return select(func.pg_notify(CHANNEL, _encode(topic, event, data)))
+
+
+def notify(db: Session, topic: str, event: str, data: Dict[str, Any]):
+    """Publish ``event`` once ``db``'s transaction commits"""
+    if BACKEND == "postgres":
+        db.execute(_notify_statement(topic, event, data))
+    else:
+        db.info.setdefault("pending_events", []).append((topic, event, data))
+
+
+async def notify_async(db: AsyncSession, topic: str, event: str,
+                       data: Dict[str, Any]):
+    """``notify`` for an AsyncSession"""
+    if BACKEND == "postgres":
+        await db.execute(_notify_statement(topic, event, data))
+    else:
+        db.info.setdefault("pending_events", []).append((topic, event, data))
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    for topic, event, data in session.info.pop("pending_events", ()):
+        bus.publish(topic, event, data)
+
+
+@sa_event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session, previous_transaction):
+    session.info.pop("pending_events", None)
+
+
+class PgEventListener:
+    """One LISTEN connection per worker, republishing to the local bus.
+
+    The psycopg2 connection's socket is watched by the event loop, so
+    notifications are handled without a thread or any polling queries.
+    """
+
+    def __init__(self, dsn: Optional[str] = None, channel: str = CHANNEL,
+                 target: EventBus = bus):
+        self.dsn = dsn
+        self.channel = channel
+        self.target = target
+        self._conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = False
+        self._connect()
+
+    def _connect(self):
+        if self._stopped:
+            return
+        try:
+            if self.dsn is None:
+                from app.db.database import DATABASE_URL
+                # LISTEN needs a session connection, not PgBouncer's
+                # transaction pooling
+                self.dsn = os.getenv("EVENTS_DATABASE_URL", DATABASE_URL)
+            conn = psycopg2.connect(self.dsn)
+            conn.set_isolation_level(
+                psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT
+            )
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+        except psycopg2.Error as e:
+            logger.warning("Event listener could not connect: %s", e)
+            self._loop.call_later(RECONNECT_SECONDS, self._connect)
+            return
+        self._conn = conn
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+        logger.info("Listening for events on %s", self.channel)
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except psycopg2.Error as e:
+            logger.warning("Event listener connection lost: %s", e)
+            self._disconnect()
+            self._loop.call_later(RECONNECT_SECONDS, self._connect)
+            return
+        while self._conn.notifies:
+            self.dispatch(self._conn.notifies.pop(0).payload)
+
+    def dispatch(self, payload: str):
+        try:
+            message = json.loads(payload)
+            self.target.publish(
+                message["topic"], message["event"], message["data"]
+            )
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed event payload: %.200s",
+                           payload)
+
+    def _disconnect(self):
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+        except (ValueError, OSError):
+            pass
+        self._conn.close()
+        self._conn = None
+
+    async def stop(self):
+        self._stopped = True
+        self._disconnect()
+
+
+listener = PgEventListener()
+
+
+async def start_listener():
+    if BACKEND == "postgres":
+        await listener.start()
+
+
+async def stop_listener():
+    if BACKEND == "postgres":
+        await listener.stop()
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serialize an event as a text/event-stream frame"""
+    data = event["data"]
+    lines = [f"event: {event['event']}"]
+    if isinstance(data, dict) and "id" in data:
+        lines.append(f"id: {data['id']}")
+    lines.append("data: " + json.dumps(data, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(topic: str,
+                     heartbeat: float = STREAM_HEARTBEAT_SECONDS):
+    """Async generator of SSE frames for ``topic`` until disconnect"""
+    subscription = bus.subscribe(topic)
+    try:
+        # Tell the client it is live so it can catch up on anything
+        # committed before it subscribed
+        yield "retry: 3000\nevent: ready\ndata: {}\n\n"
+        while True:
+            try:
+                event = await subscription.get(timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                return
+            yield format_sse(event)
+    finally:
+        subscription.close()
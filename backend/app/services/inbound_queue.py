@@ -0,0 +1,368 @@
+"""
+Durable inbound SMS queue.
+
+Twilio gives up on a webhook after 15 seconds and retries it, so the
+webhook only stores the raw payload in ``inbound_messages`` and answers
+with empty TwiML (SMS_WEBHOOK_MODE=queue). Worker threads claim pending
+rows with ``FOR UPDATE SKIP LOCKED`` and route them; the chat message, its
+fan-out and the row's PROCESSED status commit together, so webhook latency
+no longer depends on group size. SMS_WEBHOOK_MODE=inline routes inside the
+request as before.
+
+Twilio's MessageSid is stored under a unique index and retried webhooks
+carrying a known one are dropped by the same INSERT, so retries and
+redelivered rows never post or fan out a message twice.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.db.database import SessionLocal
+from app.models.inbound import InboundMessage, InboundStatus
+from app.models.models import Message
+from app.models.schemas import MessageResponse
+from app.services import events, outbound_queue, routing_cache
+from app.services.outbound_queue import enqueue_group_fanout
+from app.services.sms_routing import resolve_route, webhook_route_statement
+from app.services.sms_service import format_group_message
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_MODE = os.getenv("SMS_WEBHOOK_MODE", "queue").lower()
+WORKER_COUNT = int(os.getenv("INBOUND_QUEUE_WORKERS", "2"))
+BATCH_SIZE = int(os.getenv("INBOUND_QUEUE_BATCH_SIZE", "10"))
+POLL_INTERVAL = float(os.getenv("INBOUND_QUEUE_POLL_INTERVAL", "1.0"))
+MAX_ATTEMPTS = int(os.getenv("INBOUND_QUEUE_MAX_ATTEMPTS", "5"))
+# Rows stuck in PROCESSING longer than this are assumed orphaned by a crash
+STALE_AFTER = timedelta(
+    seconds=int(os.getenv("INBOUND_QUEUE_STALE_SECONDS", "300"))
+)
+REAP_INTERVAL = 60.0
+
+DUPLICATE_RESULT = "Duplicate message ignored"
+
+
+def queued() -> bool:
+    return WEBHOOK_MODE == "queue"
+
+
+def inbound_insert(payload: dict, **values):
+    """INSERT of a webhook ``payload``, RETURNING its id.
+
+    A MessageSid that was already stored returns no row instead (one probe
+    of the unique index); payloads without one are always inserted.
+    """
+    return (
+        pg_insert(InboundMessage)
+        .values(
+            message_sid=payload.get("MessageSid") or None,
+            from_number=payload["From"],
+            to_number=payload["To"],
+            body=payload["Body"],
+            payload=payload,
+            **values,
+        )
+        .on_conflict_do_nothing(index_elements=["message_sid"])
+        .returning(InboundMessage.id)
+    )
+
+
+def enqueue_inbound(db: Session, payload: dict) -> Optional[int]:
+    """Queue the webhook's form ``payload``; caller commits.
+
+    Returns the row id, or None for a MessageSid already received.
+    """
+    return db.execute(inbound_insert(payload)).scalar()
+
+
+async def enqueue_inbound_async(db: AsyncSession,
+                                payload: dict) -> Optional[int]:
+    return (await db.execute(inbound_insert(payload))).scalar()
+
+
+def deliver_inbound(db: Session, from_number: str, to_number: str,
+                    body: str) -> Tuple[Optional[int], str]:
+    """Route one inbound SMS and post it to its group.
+
+    Returns ``(message_id, result)``; ``message_id`` is None when the SMS
+    could not be routed and ``result`` says why. The caller owns the
+    commit and wakes the outbound workers after it.
+    """
+    rows = db.execute(webhook_route_statement(from_number)).all()
+    route, error = resolve_route(
+        rows, routing_cache.pool_numbers.lookup(db, to_number), to_number,
+        body
+    )
+    if error:
+        return None, error
+
+    db_message = Message(
+        content=route.content, user_id=route.user_id,
+        group_id=route.group_id
+    )
+    db.add(db_message)
+    db.flush()
+
+    enqueue_group_fanout(
+        db,
+        route.group_id,
+        route.user_id,
+        format_group_message(route.user_name, route.content,
+                             route.group_name),
+        from_number=route.from_number,
+        message_id=db_message.id,
+    )
+    live_message = MessageResponse(
+        id=db_message.id,
+        content=db_message.content,
+        user_id=route.user_id,
+        group_id=route.group_id,
+        created_at=db_message.created_at,
+        user_name=route.user_name,
+    )
+    events.notify(
+        db, events.group_topic(route.group_id), "message_created",
+        live_message.model_dump(mode="json"),
+    )
+    return db_message.id, f"Message sent to {route.group_name} group"
+
+
+def inline_insert(payload: dict):
+    """``inbound_insert`` for an SMS routed inside the request"""
+    return inbound_insert(payload, status=InboundStatus.PROCESSING,
+                          attempts=1)
+
+
+def receive_inline(db: Session, payload: dict) -> str:
+    """Route a webhook inside the request (SMS_WEBHOOK_MODE=inline).
+
+    With a MessageSid the SMS is recorded as processed in the same
+    transaction, so a retried webhook routes nothing. Commits; returns
+    the outcome message.
+    """
+    inbound_id = None
+    if payload.get("MessageSid"):
+        inbound_id = db.execute(inline_insert(payload)).scalar()
+        if inbound_id is None:
+            return DUPLICATE_RESULT
+
+    message_id, result = deliver_inbound(
+        db, payload["From"], payload["To"], payload["Body"]
+    )
+    if inbound_id is not None:
+        db.execute(processed_statement(inbound_id, message_id, result))
+    db.commit()
+    if message_id is not None:
+        outbound_queue.notify_workers()
+    return result
+
+
+def claim_batch(db: Session, limit: int = BATCH_SIZE) -> List:
+    """Atomically move up to ``limit`` due rows from PENDING to PROCESSING"""
+    now = datetime.now(timezone.utc)
+    due = (
+        select(InboundMessage.id)
+        .where(
+            InboundMessage.status == InboundStatus.PENDING,
+            InboundMessage.available_at <= now,
+        )
+        .order_by(InboundMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    claimed = db.execute(
+        update(InboundMessage)
+        .where(InboundMessage.id.in_(due))
+        .values(
+            status=InboundStatus.PROCESSING,
+            attempts=InboundMessage.attempts + 1,
+            claimed_at=now,
+        )
+        .returning(
+            InboundMessage.id,
+            InboundMessage.from_number,
+            InboundMessage.to_number,
+            InboundMessage.body,
+            InboundMessage.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return claimed
+
+
+def mark_statement(row_id: int, **values):
+    return (
+        update(InboundMessage)
+        .where(InboundMessage.id == row_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def processed_statement(row_id: int, message_id: Optional[int],
+                        result: str):
+    return mark_statement(
+        row_id, status=InboundStatus.PROCESSED, message_id=message_id,
+        result=result[:500], processed_at=datetime.now(timezone.utc),
+        last_error=None,
+    )
+
+
+def _mark(db: Session, row_id: int, **values):
+    db.execute(mark_statement(row_id, **values))
+
+
+def _still_claimed(db: Session, row) -> bool:
+    """Lock the row and check no other worker reclaimed it since"""
+    attempts = db.execute(
+        select(InboundMessage.attempts)
+        .where(
+            InboundMessage.id == row.id,
+            InboundMessage.status == InboundStatus.PROCESSING,
+        )
+        .with_for_update()
+    ).scalar()
+    return attempts == row.attempts
+
+
+def process_claimed(db: Session, row):
+    """Route one claimed row and record the outcome; commits.
+
+    A row requeued as stale and claimed again is routed by one worker
+    only: the other finds its claim superseded and skips it.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        if not _still_claimed(db, row):
+            db.rollback()
+            return
+        with metrics.WEBHOOK_PROCESSING.labels("worker").time():
+            message_id, result = deliver_inbound(
+                db, row.from_number, row.to_number, row.body
+            )
+        # Same transaction as the message and its fan-out
+        db.execute(processed_statement(row.id, message_id, result))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(
+            "Inbound SMS %s from %s failed (attempt %s): %s",
+            row.id, row.from_number, row.attempts, e,
+        )
+        if row.attempts >= MAX_ATTEMPTS:
+            _mark(db, row.id, status=InboundStatus.FAILED,
+                  last_error=str(e)[:500])
+        else:
+            _mark(db, row.id, status=InboundStatus.PENDING,
+                  last_error=str(e)[:500],
+                  available_at=now + timedelta(seconds=2 ** row.attempts))
+        db.commit()
+
+
+def process_pending(db: Session, limit: int = BATCH_SIZE) -> int:
+    """Claim and route one batch of queued SMS.
+
+    Returns rows processed. For tests and one-off draining; the worker
+    pool does this continuously.
+    """
+    rows = claim_batch(db, limit)
+    for row in rows:
+        process_claimed(db, row)
+    if rows:
+        outbound_queue.notify_workers()
+    return len(rows)
+
+
+def requeue_stale(db: Session) -> int:
+    """Return rows orphaned in PROCESSING by a crashed worker to the queue"""
+    cutoff = datetime.now(timezone.utc) - STALE_AFTER
+    result = db.execute(
+        update(InboundMessage)
+        .where(
+            InboundMessage.status == InboundStatus.PROCESSING,
+            InboundMessage.claimed_at < cutoff,
+        )
+        .values(status=InboundStatus.PENDING)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+class InboundWorkerPool:
+    """Background threads that drain the inbound queue"""
+
+    def __init__(self, worker_count: int = WORKER_COUNT,
+                 session_factory=SessionLocal):
+        self.worker_count = worker_count
+        self.session_factory = session_factory
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.worker_count):
+            thread = threading.Thread(
+                target=self._run, args=(i == 0,), name=f"inbound-sms-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %s inbound SMS workers", self.worker_count)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake the workers after new rows were committed"""
+        self._wake.set()
+
+    def _run(self, reaper: bool):
+        last_reap = 0.0
+        while not self._stop.is_set():
+            processed = 0
+            try:
+                with self.session_factory() as db:
+                    if reaper and time.monotonic() - last_reap > REAP_INTERVAL:
+                        requeue_stale(db)
+                        last_reap = time.monotonic()
+                    processed = process_pending(db, BATCH_SIZE)
+            except Exception:
+                logger.exception("Inbound SMS processing failed")
+            if processed < BATCH_SIZE:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+
+
+worker_pool = InboundWorkerPool()
+
+
+def start_workers():
+    if worker_pool.worker_count > 0:
+        worker_pool.start()
+
+
+def stop_workers():
+    worker_pool.stop()
+
+
+def notify_workers():
+    worker_pool.notify()
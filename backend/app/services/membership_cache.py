@@ -0,0 +1,114 @@
+"""
+In-process cache of group members for fan-out.
+
+Each cached group holds a compact tuple of ``(user_id, phone_number)``
+pairs, loaded with one narrow query that never hydrates User objects.
+Fan-out and membership checks read it instead of joining
+``user_groups`` on every message. ``member_joined`` / ``member_left``
+events, including those from other workers via the event bus, drop the
+group's entry; entries also expire after MEMBERSHIP_CACHE_TTL_SECONDS and
+the least recently used groups are evicted beyond
+MEMBERSHIP_CACHE_MAX_GROUPS.
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+import os
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models import User, user_groups
+from app.services import events
+
+TTL_SECONDS = float(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "300"))
+MAX_GROUPS = int(os.getenv("MEMBERSHIP_CACHE_MAX_GROUPS", "10000"))
+
+Members = Tuple[Tuple[int, str], ...]
+
+
+class MembershipCache:
+    """group_id -> ((user_id, phone_number), ...), LRU with a TTL"""
+
+    def __init__(self, ttl: float = TTL_SECONDS,
+                 max_groups: int = MAX_GROUPS, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_groups = max_groups
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[float, Members]]" = (
+            OrderedDict()
+        )
+        # Bumped on every invalidation so a load that raced with one is
+        # not stored
+        self._generation = 0
+
+    @staticmethod
+    def statement(group_id: int):
+        return select(User.id, User.phone_number).join(
+            user_groups, user_groups.c.user_id == User.id
+        ).where(user_groups.c.group_id == group_id).order_by(User.id)
+
+    def _get(self, group_id: int) -> Optional[Members]:
+        with self._lock:
+            entry = self._entries.get(group_id)
+            if entry is None:
+                return None
+            loaded_at, members = entry
+            if self.clock() - loaded_at >= self.ttl:
+                del self._entries[group_id]
+                return None
+            self._entries.move_to_end(group_id)
+            return members
+
+    def _store(self, group_id: int, rows, generation: int) -> Members:
+        members = tuple((user_id, phone) for user_id, phone in rows)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[group_id] = (self.clock(), members)
+                self._entries.move_to_end(group_id)
+                while len(self._entries) > self.max_groups:
+                    self._entries.popitem(last=False)
+        return members
+
+    def members(self, db: Session, group_id: int) -> Members:
+        members = self._get(group_id)
+        if members is None:
+            generation = self._generation
+            members = self._store(
+                group_id, db.execute(self.statement(group_id)), generation
+            )
+        return members
+
+    async def members_async(self, db: AsyncSession,
+                            group_id: int) -> Members:
+        members = self._get(group_id)
+        if members is None:
+            generation = self._generation
+            result = await db.execute(self.statement(group_id))
+            members = self._store(group_id, result.all(), generation)
+        return members
+
+    def is_member(self, db: Session, group_id: int, user_id: int) -> bool:
+        return any(uid == user_id for uid, _ in self.members(db, group_id))
+
+    async def is_member_async(self, db: AsyncSession, group_id: int,
+                              user_id: int) -> bool:
+        members = await self.members_async(db, group_id)
+        return any(uid == user_id for uid, _ in members)
+
+    def invalidate(self, data=None):
+        """Drop one group (``data["group_id"]``) or everything"""
+        with self._lock:
+            self._generation += 1
+            if data and data.get("group_id") is not None:
+                self._entries.pop(data["group_id"], None)
+            else:
+                self._entries.clear()
+
+
+group_members = MembershipCache()
+events.bus.add_handler("member_joined", group_members.invalidate)
+events.bus.add_handler("member_left", group_members.invalidate)
@@ -2,8 +2,10 @@ import random
 import string
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
+from app.core import metrics
 from app.models.phone_pool import OTPVerification
 from app.services.sms_service import send_otp_sms
+from app.services import events
 import logging
 import os
 
@@ -41,7 +43,12 @@ def create_otp_verification(db: Session, phone_number: str) -> str:
     db.commit()
 
     # Send OTP via SMS
-    send_otp_sms(phone_number, otp_code)
+    try:
+        send_otp_sms(phone_number, otp_code)
+    except Exception:
+        metrics.OTP_SENT.labels("error").inc()
+        raise
+    metrics.OTP_SENT.labels("ok").inc()
 
     logger.info(f"OTP sent to {phone_number}")
     return otp_code
@@ -86,4 +93,7 @@ def assign_phone_to_group(db: Session, phone_id: int, group_id: int):
         phone.status = PhoneStatus.ASSIGNED
         phone.group_id = group_id
         phone.assigned_at = datetime.utcnow()
+        events.notify(db, events.group_topic(group_id), "phone_assigned",
+                      {"group_id": group_id,
+                       "phone_number": phone.phone_number})
         db.commit()
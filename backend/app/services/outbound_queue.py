@@ -0,0 +1,380 @@
+"""
+Durable outbound SMS queue.
+
+Endpoints enqueue one row per recipient into ``outbound_messages`` inside
+the same transaction as the chat message (a single INSERT per fan-out),
+then return immediately. A pool of worker threads claims pending rows with
+``FOR UPDATE SKIP LOCKED`` and sends them, so several workers (and several
+uvicorn processes) can drain the queue concurrently without
+double-sending. Sends are paced per sender number by
+``rate_limiter.SenderRateScheduler``.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Collection, Dict, Iterable, List, Optional
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import (
+    Integer, String, bindparam, cast, func, insert, literal, or_, select,
+    update
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.db.database import SessionLocal
+from app.models.outbound import OutboundMessage, OutboundStatus
+from app.services import membership_cache, sms_service
+from app.services.rate_limiter import SenderRateScheduler
+
+logger = logging.getLogger(__name__)
+
+WORKER_COUNT = int(os.getenv("OUTBOUND_QUEUE_WORKERS", "4"))
+BATCH_SIZE = int(os.getenv("OUTBOUND_QUEUE_BATCH_SIZE", "10"))
+POLL_INTERVAL = float(os.getenv("OUTBOUND_QUEUE_POLL_INTERVAL", "1.0"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOUND_QUEUE_MAX_ATTEMPTS", "5"))
+# Rows stuck in SENDING longer than this are assumed orphaned by a crash
+STALE_AFTER = timedelta(
+    seconds=int(os.getenv("OUTBOUND_QUEUE_STALE_SECONDS", "300"))
+)
+REAP_INTERVAL = 60.0
+# Rows buffered in memory per sender number before claiming pauses for it
+SENDER_BUFFER = int(os.getenv("OUTBOUND_SENDER_BUFFER", "10"))
+# Seconds a sender lane is paused after Twilio answers 429
+THROTTLE_PENALTY = 5.0
+
+
+def enqueue_sms(
+    db: Session,
+    to_numbers: Iterable[str],
+    body: str,
+    from_number: Optional[str] = None,
+    message_id: Optional[int] = None,
+) -> int:
+    """Queue one SMS per recipient in a single multi-row INSERT.
+
+    The caller owns the commit.
+    """
+    rows = [
+        {
+            "message_id": message_id,
+            "to_number": to_number,
+            "from_number": from_number,
+            "body": body,
+        }
+        for to_number in to_numbers
+    ]
+    if not rows:
+        return 0
+    db.execute(insert(OutboundMessage).values(rows))
+    return len(rows)
+
+
+def enqueue_group_fanout(
+    db: Session,
+    group_id: int,
+    sender_id: int,
+    body: str,
+    from_number: Optional[str] = None,
+    message_id: Optional[int] = None,
+) -> int:
+    """Queue the message for every other member of ``group_id``.
+
+    Recipients come from ``membership_cache`` (loaded with one narrow
+    query on a miss) and are sent as two arrays in one INSERT ... SELECT
+    FROM unnest(), so a broadcast never hydrates User rows, joins
+    user_groups or builds a dict per recipient. The caller owns the
+    commit.
+    """
+    with metrics.FANOUT_DURATION.time():
+        members = membership_cache.group_members.members(db, group_id)
+        return _insert_fanout(db, members, sender_id, body, from_number,
+                              message_id)
+
+
+async def enqueue_group_fanout_async(
+    db: AsyncSession,
+    group_id: int,
+    sender_id: int,
+    body: str,
+    from_number: Optional[str] = None,
+    message_id: Optional[int] = None,
+) -> int:
+    """``enqueue_group_fanout`` for an AsyncSession"""
+    with metrics.FANOUT_DURATION.time():
+        members = await membership_cache.group_members.members_async(
+            db, group_id
+        )
+        count, stmt = fanout_statement(members, sender_id, body,
+                                       from_number, message_id)
+        if count:
+            await db.execute(stmt)
+    return count
+
+
+def fanout_statement(members, sender_id, body, from_number, message_id):
+    """``(recipient count, INSERT)`` queuing ``body`` for ``members``
+    other than the sender.
+
+    The recipients travel as one integer[] and one text[] parameter, so
+    the statement stays a single round trip however large the group is
+    (an executemany would be split into pages of rows).
+    """
+    user_ids = [user_id for user_id, _ in members if user_id != sender_id]
+    numbers = [number for user_id, number in members
+               if user_id != sender_id]
+    metrics.FANOUT_RECIPIENTS.observe(len(user_ids))
+    recipients = func.unnest(
+        cast(bindparam("recipient_ids", user_ids), ARRAY(Integer)),
+        cast(bindparam("recipient_numbers", numbers), ARRAY(String)),
+    ).table_valued("user_id", "to_number").render_derived()
+    stmt = insert(OutboundMessage).from_select(
+        ["recipient_user_id", "to_number", "from_number", "body",
+         "message_id"],
+        select(
+            recipients.c.user_id,
+            recipients.c.to_number,
+            literal(from_number, String),
+            literal(body, String),
+            literal(message_id, Integer),
+        ),
+    )
+    return len(user_ids), stmt
+
+
+def _insert_fanout(db, members, sender_id, body, from_number, message_id):
+    count, stmt = fanout_statement(members, sender_id, body, from_number,
+                                   message_id)
+    if count:
+        db.execute(stmt)
+    return count
+
+
+def claim_batch(
+    db: Session,
+    limit: int = BATCH_SIZE,
+    exclude_senders: Collection[str] = (),
+) -> List:
+    """Atomically move up to ``limit`` due rows from PENDING to SENDING.
+
+    Rows from ``exclude_senders`` (already backlogged in this process) are
+    left for later; ``""`` stands for the default Twilio number.
+    """
+    now = datetime.now(timezone.utc)
+    conditions = [
+        OutboundMessage.status == OutboundStatus.PENDING,
+        OutboundMessage.available_at <= now,
+    ]
+    numbers = [n for n in exclude_senders if n]
+    if numbers:
+        conditions.append(or_(
+            OutboundMessage.from_number.is_(None),
+            OutboundMessage.from_number.notin_(numbers),
+        ))
+    if "" in exclude_senders:
+        conditions.append(OutboundMessage.from_number.isnot(None))
+    due = (
+        select(OutboundMessage.id)
+        .where(*conditions)
+        .order_by(OutboundMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    claimed = db.execute(
+        update(OutboundMessage)
+        .where(OutboundMessage.id.in_(due))
+        .values(
+            status=OutboundStatus.SENDING,
+            attempts=OutboundMessage.attempts + 1,
+            claimed_at=now,
+        )
+        .returning(
+            OutboundMessage.id,
+            OutboundMessage.to_number,
+            OutboundMessage.from_number,
+            OutboundMessage.body,
+            OutboundMessage.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return claimed
+
+
+def _record_result(db: Session, row, sid=None, error=None):
+    now = datetime.now(timezone.utc)
+    if error is None:
+        values = dict(status=OutboundStatus.SENT, twilio_sid=sid,
+                      sent_at=now, last_error=None)
+    elif row.attempts >= MAX_ATTEMPTS:
+        values = dict(status=OutboundStatus.FAILED, last_error=error[:500])
+    else:
+        # Exponential backoff: 2s, 4s, 8s, ...
+        values = dict(
+            status=OutboundStatus.PENDING,
+            last_error=error[:500],
+            available_at=now + timedelta(seconds=2 ** row.attempts),
+        )
+    db.execute(
+        update(OutboundMessage)
+        .where(OutboundMessage.id == row.id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _send_claimed(db: Session, row, scheduler=None):
+    """Send one claimed row and record the outcome (caller commits)"""
+    try:
+        sid = sms_service.send_sms(row.to_number, row.body, row.from_number)
+        _record_result(db, row, sid=sid)
+    except Exception as e:
+        logger.warning(
+            "Outbound SMS %s to %s failed (attempt %s): %s",
+            row.id, row.to_number, row.attempts, e,
+        )
+        if scheduler and getattr(e, "status", None) == 429:
+            # Twilio says this number is over its rate; back the lane off
+            scheduler.penalize(row.from_number or "", THROTTLE_PENALTY)
+        _record_result(db, row, error=str(e))
+
+
+def dispatch_pending(db: Session, limit: int = BATCH_SIZE) -> int:
+    """Claim and send one batch of queued SMS, unpaced.
+
+    Returns rows processed. The worker pool paces sends per sender number
+    instead; this is for tests and one-off draining.
+    """
+    rows = claim_batch(db, limit)
+    for row in rows:
+        _send_claimed(db, row)
+    if rows:
+        db.commit()
+    return len(rows)
+
+
+def requeue_stale(db: Session) -> int:
+    """Return rows orphaned in SENDING by a crashed worker to the queue"""
+    cutoff = datetime.now(timezone.utc) - STALE_AFTER
+    result = db.execute(
+        update(OutboundMessage)
+        .where(
+            OutboundMessage.status == OutboundStatus.SENDING,
+            OutboundMessage.claimed_at < cutoff,
+        )
+        .values(status=OutboundStatus.PENDING)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+class OutboundWorkerPool:
+    """Background threads that drain the outbound queue.
+
+    A claimer thread moves due rows into a per-sender rate scheduler, never
+    buffering more than SENDER_BUFFER rows for one number, and sender
+    threads send whatever the scheduler releases.
+    """
+
+    def __init__(self, worker_count: int = WORKER_COUNT,
+                 session_factory=SessionLocal, scheduler=None):
+        self.worker_count = worker_count
+        self.session_factory = session_factory
+        self.scheduler = scheduler or SenderRateScheduler()
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        targets = [("outbound-claimer", self._claim_loop)] + [
+            (f"outbound-sms-{i}", self._send_loop)
+            for i in range(self.worker_count)
+        ]
+        for name, target in targets:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %s outbound SMS workers", self.worker_count)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        self.scheduler.wake_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake the claimer after new rows were committed"""
+        self._wake.set()
+
+    def queue_depths(self) -> Dict[str, int]:
+        return self.scheduler.queue_depths()
+
+    def _backlogged_senders(self) -> List[str]:
+        return [
+            sender for sender, depth in self.scheduler.queue_depths().items()
+            if depth >= SENDER_BUFFER
+        ]
+
+    def _claim_loop(self):
+        last_reap = 0.0
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                with self.session_factory() as db:
+                    # One thread per process sweeps for orphaned rows
+                    if time.monotonic() - last_reap > REAP_INTERVAL:
+                        requeue_stale(db)
+                        last_reap = time.monotonic()
+                    rows = claim_batch(
+                        db, BATCH_SIZE, self._backlogged_senders()
+                    )
+                    for row in rows:
+                        self.scheduler.submit(row.from_number or "", row)
+                    claimed = len(rows)
+            except Exception:
+                logger.exception("Outbound SMS claim failed")
+            if claimed < BATCH_SIZE:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+
+    def _send_loop(self):
+        while not self._stop.is_set():
+            ready = self.scheduler.next_ready(POLL_INTERVAL)
+            if ready is None:
+                continue
+            sender, row = ready
+            try:
+                with self.session_factory() as db:
+                    _send_claimed(db, row, self.scheduler)
+                    db.commit()
+            except Exception:
+                logger.exception("Outbound SMS %s send failed", row.id)
+            if self.scheduler.depth(sender) in (0, SENDER_BUFFER // 2):
+                # The lane is running low; let the claimer top it up
+                self._wake.set()
+
+
+worker_pool = OutboundWorkerPool()
+
+
+def start_workers():
+    if worker_pool.worker_count > 0:
+        worker_pool.start()
+
+
+def stop_workers():
+    worker_pool.stop()
+
+
+def notify_workers():
+    worker_pool.notify()
@@ -0,0 +1,140 @@
+"""
+Per-sender-number pacing for outbound SMS.
+
+Carriers throttle each long code to roughly one message per second. The
+scheduler keeps one FIFO and one token bucket per sender number; sender
+threads pull whichever number has both queued work and a token, so every
+pool number can be kept busy in parallel without any single number
+exceeding its rate.
+
+Limits are enforced per process. For a strict global limit run the
+outbound workers in one process (OUTBOUND_QUEUE_WORKERS=0 elsewhere).
+"""
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+import os
+import threading
+import time
+
+RATE_PER_SENDER = float(os.getenv("OUTBOUND_RATE_PER_SENDER", "1.0"))
+BURST_PER_SENDER = int(os.getenv("OUTBOUND_BURST_PER_SENDER", "1"))
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` per second"""
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if available now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> bool:
+        if self.wait_time(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+    def penalize(self, seconds: float, now: float):
+        """Push the next token ``seconds`` into the future (e.g. on 429)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class SenderRateScheduler:
+    """FIFO per sender number, released at that number's rate"""
+
+    def __init__(self, rate: float = RATE_PER_SENDER,
+                 burst: int = BURST_PER_SENDER,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._queues: Dict[str, Deque[Any]] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._cond = threading.Condition()
+
+    def submit(self, sender: str, item: Any):
+        with self._cond:
+            if sender not in self._queues:
+                self._queues[sender] = deque()
+                self._buckets[sender] = TokenBucket(
+                    self.rate, self.burst, self.clock()
+                )
+            self._queues[sender].append(item)
+            self._cond.notify()
+
+    def poll(self) -> Tuple[Optional[Tuple[str, Any]], Optional[float]]:
+        """Non-blocking take.
+
+        Returns ``((sender, item), None)`` when something may be sent now,
+        otherwise ``(None, wait)`` where ``wait`` is the time until the
+        next sender gets a token (None if nothing is queued).
+        """
+        with self._cond:
+            return self._poll_locked()
+
+    def _poll_locked(self):
+        now = self.clock()
+        soonest = None
+        for sender, queue in self._queues.items():
+            if not queue:
+                continue
+            bucket = self._buckets[sender]
+            if bucket.consume(now):
+                return (sender, queue.popleft()), None
+            wait = bucket.wait_time(now)
+            soonest = wait if soonest is None else min(soonest, wait)
+        return None, soonest
+
+    def next_ready(self, timeout: float) -> Optional[Tuple[str, Any]]:
+        """Block up to ``timeout`` seconds for a sendable item"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                ready, wait = self._poll_locked()
+                if ready:
+                    return ready
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(
+                    remaining if wait is None else min(wait, remaining)
+                )
+
+    def penalize(self, sender: str, seconds: float):
+        with self._cond:
+            bucket = self._buckets.get(sender)
+            if bucket:
+                bucket.penalize(seconds, self.clock())
+
+    def depth(self, sender: str) -> int:
+        with self._cond:
+            return len(self._queues.get(sender, ()))
+
+    def queue_depths(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                sender: len(queue)
+                for sender, queue in self._queues.items() if queue
+            }
+
+    def total_depth(self) -> int:
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def wake_all(self):
+        with self._cond:
+            self._cond.notify_all()
@@ -0,0 +1,109 @@
+"""
+In-process cache of pool number -> (group_id, group_name).
+
+Inbound SMS are routed by the pool number they were sent to, and those
+assignments change rarely (assign_phone_to_group, admin status changes).
+The whole map of assigned numbers is small, so it is loaded in one query
+and then served from memory. Every ``phone_assigned`` event, including
+those from other workers via the event bus, drops the map; it is also
+reloaded after ROUTING_CACHE_TTL_SECONDS as a safety net.
+"""
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models import Group
+from app.models.phone_pool import PhoneNumber, PhoneStatus
+from app.services import events
+
+logger = logging.getLogger(__name__)
+
+TTL_SECONDS = float(os.getenv("ROUTING_CACHE_TTL_SECONDS", "300"))
+
+GroupRoute = Tuple[int, str]
+
+
+class PoolNumberCache:
+    """Assigned pool numbers and their groups, reloaded on demand"""
+
+    def __init__(self, ttl: float = TTL_SECONDS, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._routes: Dict[str, GroupRoute] = {}
+        self._loaded_at: Optional[float] = None
+        # Bumped by invalidate() so a load that raced with an
+        # invalidation is not kept
+        self._generation = 0
+
+    @staticmethod
+    def statement():
+        return select(
+            PhoneNumber.phone_number, Group.id, Group.name
+        ).join(
+            Group, Group.id == PhoneNumber.group_id
+        ).where(PhoneNumber.status == PhoneStatus.ASSIGNED)
+
+    def _fresh(self) -> bool:
+        return (self._loaded_at is not None
+                and self.clock() - self._loaded_at < self.ttl)
+
+    def _store(self, rows, generation: int):
+        routes = {number: (group_id, name) for number, group_id, name in rows}
+        with self._lock:
+            if generation == self._generation:
+                self._routes = routes
+                self._loaded_at = self.clock()
+        return routes
+
+    def lookup(self, db: Session, number: str) -> Optional[GroupRoute]:
+        """Group a pool number is assigned to, None if not assigned"""
+        routes = self._routes
+        if not self._fresh():
+            generation = self._generation
+            routes = self._store(db.execute(self.statement()).all(),
+                                 generation)
+        return routes.get(number)
+
+    async def lookup_async(self, db: AsyncSession,
+                           number: str) -> Optional[GroupRoute]:
+        routes = self._routes
+        if not self._fresh():
+            generation = self._generation
+            result = await db.execute(self.statement())
+            routes = self._store(result.all(), generation)
+        return routes.get(number)
+
+    def warm(self, db: Session):
+        self._store(db.execute(self.statement()).all(), self._generation)
+        logger.info("Routing cache loaded %d pool numbers",
+                    len(self._routes))
+
+    def invalidate(self, data=None):
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = None
+
+
+pool_numbers = PoolNumberCache()
+events.bus.add_handler("phone_assigned", pool_numbers.invalidate)
+
+
+def warm():
+    """Load the pool number map at startup"""
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        pool_numbers.warm(db)
+    except Exception as e:
+        # Not fatal: the first webhook loads it instead
+        logger.warning("Could not warm routing cache: %s", e)
+    finally:
+        db.close()
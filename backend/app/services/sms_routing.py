@@ -0,0 +1,115 @@
+"""
+Routing of inbound SMS to a group.
+
+Shared by the sync and async webhooks and the inbound queue workers.
+"""
+from typing import NamedTuple, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app.models.models import User, Group, user_groups
+from app.models.phone_pool import PhoneNumber
+from app.services.routing_cache import GroupRoute
+from app.services.sms_service import parse_sms_command
+
+
+class Membership(NamedTuple):
+    id: int
+    name: str
+    phone_number: Optional[str]
+
+
+class WebhookRoute(NamedTuple):
+    user_id: int
+    user_name: str
+    group_id: int
+    group_name: str
+    from_number: Optional[str]
+    content: str
+
+
+def route_by_command(groups, body: str):
+    """Pick the destination among the sender's ``groups`` (anything with a
+    ``name``) from an @"Group Name" prefix, or their only group.
+
+    Returns ``(group, content, error)``.
+    """
+    group_name, stripped = parse_sms_command(body)
+    if group_name:
+        for g in groups:
+            if g.name.lower() == group_name.lower():
+                return g, stripped, None
+        return None, body, (
+            f"Group '{group_name}' not found or you are not a member"
+        )
+    if len(groups) == 1:
+        return groups[0], body, None
+    return None, body, (
+        'Multiple groups detected. Prefix message with '
+        '@"Group Name" to specify destination.'
+    )
+
+
+def webhook_route_statement(from_number: str):
+    """One SELECT for the sender and their memberships.
+
+    Returns one row per group the sender belongs to, with the group's
+    pool number (a single row with NULL group columns if none, no rows
+    for an unknown sender). The To number is resolved from
+    ``routing_cache`` rather than joined in.
+    """
+    group_phone = aliased(PhoneNumber)
+    return (
+        select(
+            User.id.label("user_id"),
+            User.name.label("user_name"),
+            Group.id.label("group_id"),
+            Group.name.label("group_name"),
+            group_phone.phone_number.label("group_phone"),
+        )
+        .select_from(User)
+        .outerjoin(user_groups, user_groups.c.user_id == User.id)
+        .outerjoin(Group, Group.id == user_groups.c.group_id)
+        .outerjoin(group_phone, group_phone.group_id == Group.id)
+        .where(User.phone_number == from_number)
+    )
+
+
+def resolve_route(rows, routed: Optional[GroupRoute], to_number: str,
+                  body: str):
+    """Destination of an inbound SMS.
+
+    ``rows`` come from ``webhook_route_statement``; ``routed`` is the
+    group ``to_number`` is assigned to, if any. Returns
+    ``(route, error)``.
+    """
+    if not rows:
+        return None, "User not registered"
+    sender = rows[0]
+    memberships = {
+        row.group_id: Membership(row.group_id, row.group_name,
+                                 row.group_phone)
+        for row in rows if row.group_id is not None
+    }
+
+    # Route by assigned pool phone if available
+    if routed is not None:
+        group_id, group_name = routed
+        if group_id not in memberships:
+            return None, (
+                f"You are not a member of the '{group_name}' group"
+            )
+        return WebhookRoute(
+            sender.user_id, sender.user_name, group_id, group_name,
+            to_number, body
+        ), None
+
+    # Fallback: support @"Group Name" or single-group routing
+    group, content, error = route_by_command(
+        list(memberships.values()), body
+    )
+    if error:
+        return None, error
+    return WebhookRoute(
+        sender.user_id, sender.user_name, group.id, group.name,
+        group.phone_number, content
+    ), None
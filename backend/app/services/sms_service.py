@@ -1,8 +1,10 @@
-from twilio.rest import Client
+from app.core import metrics
+from app.services import twilio_transport
 import os
 from dotenv import load_dotenv
 import re
 import logging
+import asyncio
 
 load_dotenv()
 
@@ -16,7 +18,7 @@ mock_sms = os.getenv('MOCK_SMS', 'true').lower() == 'true'
 logger = logging.getLogger(__name__)
 
 if not mock_sms and account_sid and auth_token:
-    client = Client(account_sid, auth_token)
+    client = twilio_transport.build_client(account_sid, auth_token)
 else:
     client = None
     if mock_sms:
@@ -26,6 +28,20 @@ else:
         )
 
 
+_async_client = None
+
+
+def _deliver(body: str, from_number: str, to_number: str):
+    """Create the message via Twilio, bounded per sender number"""
+    with twilio_transport.limiter.slot(from_number), metrics.twilio_call():
+        message = client.messages.create(
+            body=body,
+            from_=from_number,
+            to=to_number
+        )
+    return message.sid
+
+
 def send_welcome_sms(to_number: str, group_name: str):
     """Send welcome SMS when user joins a group"""
     body = (
@@ -34,33 +50,24 @@ def send_welcome_sms(to_number: str, group_name: str):
     )
 
     if client:
-        message = client.messages.create(
-            body=body,
-            from_=twilio_phone_number,
-            to=to_number
-        )
-        return message.sid
+        return _deliver(body, twilio_phone_number, to_number)
     else:
         logger.info(f"[MOCK SMS] To: {to_number}")
         logger.info(f"[MOCK SMS] Message: {body}")
         return "mock-message-id"
 
 
-def send_group_message(
-    to_number: str, from_name: str, content: str,
-    group_name: str, group_phone_number: str = None
-):
-    """Send group message to a member"""
-    body = f"[{group_name}] {from_name}: {content}"
-    from_number = group_phone_number or twilio_phone_number
+def format_group_message(from_name: str, content: str, group_name: str):
+    """Build the SMS body relayed to group members"""
+    return f"[{group_name}] {from_name}: {content}"
+
+
+def send_sms(to_number: str, body: str, from_number: str = None):
+    """Send a single SMS, defaulting to the shared Twilio number"""
+    from_number = from_number or twilio_phone_number
 
     if client:
-        message = client.messages.create(
-            body=body,
-            from_=from_number,
-            to=to_number
-        )
-        return message.sid
+        return _deliver(body, from_number, to_number)
     else:
         logger.info(f"[MOCK SMS] To: {to_number}")
         logger.info(f"[MOCK SMS] From: {from_number}")
@@ -68,6 +75,40 @@ def send_group_message(
         return "mock-message-id"
 
 
+async def send_sms_async(to_number: str, body: str, from_number: str = None):
+    """Async variant of send_sms for use from an event loop.
+
+    Uses the aiohttp transport when TWILIO_TRANSPORT=async, otherwise runs
+    the pooled synchronous client in a worker thread.
+    """
+    global _async_client
+    from_number = from_number or twilio_phone_number
+
+    if client and twilio_transport.TRANSPORT == "async":
+        if _async_client is None:
+            _async_client = twilio_transport.build_async_client(
+                account_sid, auth_token
+            )
+        async with twilio_transport.limiter.async_slot(from_number):
+            with metrics.twilio_call():
+                message = await _async_client.messages.create_async(
+                    body=body,
+                    from_=from_number,
+                    to=to_number
+                )
+        return message.sid
+    return await asyncio.to_thread(send_sms, to_number, body, from_number)
+
+
+def send_group_message(
+    to_number: str, from_name: str, content: str,
+    group_name: str, group_phone_number: str = None
+):
+    """Send group message to a member"""
+    body = format_group_message(from_name, content, group_name)
+    return send_sms(to_number, body, group_phone_number)
+
+
 def send_welcome_sms_with_phone(
     to_number: str, group_name: str, group_phone_number: str
 ):
@@ -78,12 +119,7 @@ def send_welcome_sms_with_phone(
     )
 
     if client:
-        message = client.messages.create(
-            body=body,
-            from_=group_phone_number,
-            to=to_number
-        )
-        return message.sid
+        return _deliver(body, group_phone_number, to_number)
     else:
         logger.info(f"[MOCK SMS] To: {to_number}")
         logger.info(f"[MOCK SMS] From: {group_phone_number}")
@@ -99,12 +135,7 @@ def send_otp_sms(to_number: str, otp_code: str):
     )
 
     if client:
-        message = client.messages.create(
-            body=body,
-            from_=twilio_phone_number,
-            to=to_number
-        )
-        return message.sid
+        return _deliver(body, twilio_phone_number, to_number)
     else:
         logger.info(f"[MOCK SMS] To: {to_number}")
         logger.info(f"[MOCK SMS] OTP: {body}")
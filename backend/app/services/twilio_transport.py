@@ -0,0 +1,139 @@
+"""
+HTTP transport for the Twilio REST client.
+
+Twilio's default client opens a plain ``requests.Session`` with urllib3's
+default pool of 10 connections and no limit on parallel requests. This
+module builds a client whose session keeps a configurable pool of
+keep-alive connections, caps in-flight requests per sender number, and can
+point at a local fake Twilio server for tests and benchmarks. An asyncio
+variant backed by aiohttp is also available.
+"""
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+import asyncio
+import os
+import threading
+
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+POOL_SIZE = int(os.getenv("TWILIO_HTTP_POOL_SIZE", "20"))
+TIMEOUT = float(os.getenv("TWILIO_HTTP_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("TWILIO_HTTP_MAX_RETRIES", "0"))
+MAX_INFLIGHT_PER_SENDER = int(
+    os.getenv("TWILIO_MAX_INFLIGHT_PER_SENDER", "4")
+)
+# e.g. http://127.0.0.1:8099 to target tests/fake_twilio.py
+API_BASE_URL = os.getenv("TWILIO_API_BASE_URL")
+# "sync" (requests) or "async" (aiohttp, used by send_sms_async)
+TRANSPORT = os.getenv("TWILIO_TRANSPORT", "sync").lower()
+
+
+def _rebase(url: str, base_url: Optional[str]) -> str:
+    """Swap scheme and host of a Twilio API URL for ``base_url``"""
+    if not base_url:
+        return url
+    base = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit(
+        (base.scheme, base.netloc, parts.path, parts.query, parts.fragment)
+    )
+
+
+class PooledTwilioHttpClient(TwilioHttpClient):
+    """TwilioHttpClient with a sized keep-alive connection pool"""
+
+    def __init__(self, pool_size: int = POOL_SIZE,
+                 timeout: Optional[float] = TIMEOUT,
+                 max_retries: int = MAX_RETRIES,
+                 base_url: Optional[str] = API_BASE_URL):
+        super().__init__(pool_connections=True, timeout=timeout)
+        self.base_url = base_url
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=max_retries,
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Connection"] = "keep-alive"
+
+    def request(self, method, url, *args, **kwargs):
+        return super().request(
+            method, _rebase(url, self.base_url), *args, **kwargs
+        )
+
+
+class SenderConcurrencyLimiter:
+    """Bounds the number of in-flight API calls per sender number"""
+
+    def __init__(self, max_inflight: int = MAX_INFLIGHT_PER_SENDER):
+        self.max_inflight = max_inflight
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._async_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, sender: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(sender)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_inflight)
+                self._semaphores[sender] = semaphore
+            return semaphore
+
+    @contextmanager
+    def slot(self, sender: Optional[str]):
+        semaphore = self._semaphore(sender or "")
+        with semaphore:
+            yield
+
+    @asynccontextmanager
+    async def async_slot(self, sender: Optional[str]):
+        # Only ever touched from the event loop thread
+        semaphore = self._async_semaphores.get(sender or "")
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_inflight)
+            self._async_semaphores[sender or ""] = semaphore
+        async with semaphore:
+            yield
+
+
+limiter = SenderConcurrencyLimiter()
+
+
+def build_client(account_sid: str, auth_token: str) -> Client:
+    """Twilio client using the pooled synchronous transport"""
+    return Client(
+        account_sid, auth_token, http_client=PooledTwilioHttpClient()
+    )
+
+
+def build_async_client(account_sid: str, auth_token: str) -> Client:
+    """Twilio client for ``create_async`` calls.
+
+    Uses ``aiohttp`` and ``aiohttp-retry`` and must be created from
+    inside a running event loop.
+    """
+    try:
+        from twilio.http.async_http_client import AsyncTwilioHttpClient
+    except ImportError as e:
+        raise RuntimeError(
+            "TWILIO_TRANSPORT=async requires aiohttp and aiohttp-retry"
+        ) from e
+
+    class PooledAsyncTwilioHttpClient(AsyncTwilioHttpClient):
+        async def request(self, method, url, *args, **kwargs):
+            return await super().request(
+                method, _rebase(url, API_BASE_URL), *args, **kwargs
+            )
+
+    return Client(
+        account_sid, auth_token,
+        http_client=PooledAsyncTwilioHttpClient(
+            timeout=TIMEOUT,
+            max_retries=MAX_RETRIES or None,
+        ),
+    )
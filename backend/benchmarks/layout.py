@@ -0,0 +1,54 @@
+"""
+Ids, phone numbers and memberships of the benchmark dataset.
+
+seed.py gives every row an explicit id, so all of these follow from the
+dataset sizes alone: the load generator can drive a server seeded earlier
+(even from another process) without reading the database. Sizes come
+from BENCH_USERS, BENCH_GROUPS, BENCH_MESSAGES and BENCH_MEMBERS (members
+per group).
+"""
+from typing import List
+import os
+
+
+class Layout:
+    """Ids, numbers and memberships of a seeded dataset"""
+
+    def __init__(self, users: int = None, groups: int = None,
+                 messages: int = None, members: int = None):
+        self.users = users or int(os.getenv("BENCH_USERS", "2000"))
+        self.groups = groups or int(os.getenv("BENCH_GROUPS", "200"))
+        self.messages = messages or int(os.getenv("BENCH_MESSAGES", "50000"))
+        self.members = members or int(os.getenv("BENCH_MEMBERS", "50"))
+        if self.members >= self.users:
+            raise ValueError("BENCH_MEMBERS must be below BENCH_USERS")
+
+    def config(self) -> dict:
+        return {"users": self.users, "groups": self.groups,
+                "messages": self.messages, "members": self.members}
+
+    @property
+    def group_ids(self) -> range:
+        return range(1, self.groups + 1)
+
+    @staticmethod
+    def user_number(user_id: int) -> str:
+        return f"+1555{user_id:07d}"
+
+    @staticmethod
+    def group_number(group_id: int) -> str:
+        return f"+1666{group_id:07d}"
+
+    @staticmethod
+    def group_name(group_id: int) -> str:
+        return f"Bench Group {group_id:05d}"
+
+    def group_members(self, group_id: int) -> List[int]:
+        # Consecutive users, so neighbouring groups overlap
+        start = (group_id - 1) * self.members
+        return [(start + k) % self.users + 1 for k in range(self.members)]
+
+    def outsider(self, group_id: int) -> int:
+        """A user who is not a member of ``group_id``"""
+        start = (group_id - 1) * self.members
+        return (start + self.members) % self.users + 1
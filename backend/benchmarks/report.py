@@ -0,0 +1,148 @@
+"""
+JSON benchmark reports and regression checks.
+
+Two report formats are understood: pytest-benchmark's ``--benchmark-json``
+output (``make bench``) and the load generator's report (``make
+bench-load``). Both are flattened to ``{"<benchmark>.<metric>": value}``
+so two runs can be compared metric by metric:
+
+    python -m benchmarks.report old.json new.json --threshold 0.15
+
+exits with status 1 when any metric got worse by more than the threshold.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+import argparse
+import json
+import subprocess
+import sys
+
+# Direction of each metric; anything else is reported but never flagged
+LOWER_IS_BETTER = ("_ms", "errors", "db_queries")
+HIGHER_IS_BETTER = ("rps", "ops", "per_second")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def new_report(config: dict) -> dict:
+    return {
+        "kind": "loadgen",
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": config,
+        "scenarios": {},
+    }
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Request count, throughput and latency percentiles in ms"""
+    latencies = sorted(latencies)
+    ms = [seconds * 1000 for seconds in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ms, 0.50), 2),
+        "p95_ms": round(percentile(ms, 0.95), 2),
+        "p99_ms": round(percentile(ms, 0.99), 2),
+        "max_ms": round(ms[-1], 2) if ms else 0.0,
+    }
+
+
+def flatten(report: dict) -> Dict[str, float]:
+    """``{"<benchmark>.<metric>": value}`` for either report format"""
+    metrics = {}
+    if "benchmarks" in report:
+        # pytest-benchmark; its stats are in seconds
+        for bench in report["benchmarks"]:
+            stats = bench["stats"]
+            name = bench["name"]
+            metrics[f"{name}.median_ms"] = stats["median"] * 1000
+            metrics[f"{name}.mean_ms"] = stats["mean"] * 1000
+            metrics[f"{name}.ops"] = stats["ops"]
+            for key, value in (bench.get("extra_info") or {}).items():
+                if isinstance(value, (int, float)):
+                    metrics[f"{name}.{key}"] = value
+    else:
+        for name, values in report.get("scenarios", {}).items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    metrics[f"{name}.{key}"] = value
+    return metrics
+
+
+def _direction(metric: str) -> int:
+    """-1 if lower is better, 1 if higher is better, 0 if neither"""
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> List[dict]:
+    """Metric-by-metric changes; ``regression`` marks a change for the
+    worse beyond ``threshold`` (a fraction of the old value)"""
+    before, after = flatten(old), flatten(new)
+    rows = []
+    for metric in sorted(before.keys() & after.keys()):
+        old_value, new_value = before[metric], after[metric]
+        change = ((new_value - old_value) / old_value
+                  if old_value else 0.0)
+        direction = _direction(metric)
+        if not old_value:
+            # A count appearing from zero (e.g. errors) is still worse
+            worse = direction < 0 and new_value > 0
+        else:
+            worse = direction * change < -threshold
+        rows.append({"metric": metric, "old": old_value, "new": new_value,
+                     "change": change, "regression": worse})
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark JSON reports"
+    )
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Fractional change that counts as a "
+                             "regression (default 0.1)")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    rows = compare(old, new, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['metric']:<60} {row['old']:>12.2f} {row['new']:>12.2f}"
+              f" {row['change']:>+8.1%} {flag}")
+    regressions = [row for row in rows if row["regression"]]
+    print(f"{len(rows)} metrics compared, {len(regressions)} regressed "
+          f"beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Seeds the benchmark dataset described by a Layout.
+
+``seed`` TRUNCATEs every application table first, so only point it at a
+database you can throw away.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.db.database import Base
+from app.models.models import Group, Message, User, user_groups
+from app.models.phone_pool import PhoneNumber, PhoneStatus
+from benchmarks.layout import Layout
+
+CHUNK_SIZE = 5000
+
+
+def reset(db: Session):
+    tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+    db.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+
+def _insert_chunked(db: Session, target, rows):
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.execute(insert(target), rows[i:i + CHUNK_SIZE])
+
+
+def _advance_sequence(db: Session, table: str):
+    db.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+    ))
+
+
+def seed(db: Session, layout: Layout) -> Layout:
+    """Replace the database contents with ``layout`` and commit"""
+    reset(db)
+    now = datetime.now(timezone.utc)
+
+    _insert_chunked(db, User, [
+        {"id": uid, "name": f"Bench User {uid}",
+         "phone_number": layout.user_number(uid)}
+        for uid in range(1, layout.users + 1)
+    ])
+    _insert_chunked(db, Group, [
+        {"id": gid, "name": layout.group_name(gid),
+         "member_count": layout.members}
+        for gid in layout.group_ids
+    ])
+    _insert_chunked(db, PhoneNumber, [
+        {"id": gid, "phone_number": layout.group_number(gid),
+         "status": PhoneStatus.ASSIGNED, "group_id": gid, "assigned_at": now}
+        for gid in layout.group_ids
+    ])
+    _insert_chunked(db, user_groups, [
+        {"user_id": uid, "group_id": gid}
+        for gid in layout.group_ids
+        for uid in layout.group_members(gid)
+    ])
+
+    messages = []
+    for i in range(layout.messages):
+        gid = i % layout.groups + 1
+        members = layout.group_members(gid)
+        messages.append({
+            "id": i + 1, "content": f"Bench message {i + 1}",
+            "user_id": members[i // layout.groups % len(members)],
+            "group_id": gid,
+        })
+    _insert_chunked(db, Message, messages)
+
+    for table in ("users", "groups", "phone_numbers", "messages"):
+        _advance_sequence(db, table)
+    db.commit()
+    return layout
@@ -0,0 +1,269 @@
+"""
+Hot-path benchmarks against the seeded dataset.
+
+Run with ``make bench``, or directly:
+    python -m pytest benchmarks --benchmark-json=report.json
+
+Every benchmark records the SQL statement count of its last request in
+``extra_info["db_queries"]``, so query-count regressions show up in the
+report alongside timing ones. Write paths run a fixed number of rounds
+(BENCH_WRITE_ROUNDS) and drain the SMS queues through the fake Twilio
+server outside the timed part, unless delivery is what is measured.
+"""
+import itertools
+import os
+
+import pytest
+
+from app.models.inbound import InboundMessage
+from app.models.models import Message
+from app.services import inbound_queue
+from app.services.outbound_queue import dispatch_pending
+
+WRITE_ROUNDS = int(os.getenv("BENCH_WRITE_ROUNDS", "20"))
+WEBHOOK_BATCH = int(os.getenv("BENCH_WEBHOOK_BATCH", "10"))
+
+_message_sids = itertools.count(1)
+
+
+def next_message_sid() -> str:
+    return f"SM{next(_message_sids):032d}"
+
+
+def record_queries(benchmark, response):
+    benchmark.extra_info["db_queries"] = int(
+        response.headers["x-db-query-count"]
+    )
+
+
+def drain_outbound(db) -> int:
+    sent = 0
+    while batch := dispatch_pending(db, limit=100):
+        sent += batch
+    return sent
+
+
+def drain_inbound(db) -> int:
+    routed = 0
+    while batch := inbound_queue.process_pending(db, limit=100):
+        routed += batch
+    return routed
+
+
+def webhook_form(layout, group_id: int, body: str) -> dict:
+    return {
+        "From": layout.user_number(layout.group_members(group_id)[0]),
+        "To": layout.group_number(group_id),
+        "Body": body,
+        "MessageSid": next_message_sid(),
+    }
+
+
+def routed_messages(db, body: str) -> int:
+    """Chat messages the webhooks with ``body`` were routed into"""
+    return db.query(Message).filter(Message.content == body).count()
+
+
+@pytest.fixture
+def webhook_mode(monkeypatch):
+    def set_mode(mode):
+        monkeypatch.setattr(inbound_queue, "WEBHOOK_MODE", mode)
+    return set_mode
+
+
+class TestReadPaths:
+    """Group search and history paging"""
+
+    def test_group_search(self, benchmark, client, layout):
+        # Four-digit prefixes such as "0012" match ten group names each
+        terms = itertools.cycle(
+            f"{gid:05d}"[:4] for gid in layout.group_ids
+        )
+
+        def search():
+            response = client.get("/api/groups/", params={
+                "search": next(terms), "limit": 50
+            })
+            assert response.status_code == 200
+            return response
+
+        record_queries(benchmark, benchmark(search))
+
+    def test_group_listing_page(self, benchmark, client, layout):
+        offsets = itertools.cycle(range(0, layout.groups, 50))
+
+        def listing():
+            response = client.get("/api/groups/", params={
+                "limit": 50, "offset": next(offsets)
+            })
+            assert response.status_code == 200
+            return response
+
+        record_queries(benchmark, benchmark(listing))
+
+    def test_history_latest_page(self, benchmark, client, layout):
+        groups = itertools.cycle(layout.group_ids)
+
+        def latest_page():
+            response = client.get(f"/api/groups/{next(groups)}/messages",
+                                  params={"limit": 50})
+            assert response.status_code == 200
+            return response
+
+        record_queries(benchmark, benchmark(latest_page))
+
+    def test_history_deep_page(self, benchmark, client, layout):
+        # A cursor halfway back through every group's history
+        before = layout.messages // 2
+        groups = itertools.cycle(layout.group_ids)
+
+        def deep_page():
+            response = client.get(f"/api/groups/{next(groups)}/messages",
+                                  params={"limit": 50, "before": before})
+            assert response.status_code == 200
+            return response
+
+        record_queries(benchmark, benchmark(deep_page))
+
+    def test_history_not_modified(self, benchmark, client, layout):
+        url = f"/api/groups/{layout.groups}/messages"
+        etag = client.get(url, params={"limit": 50}).headers["etag"]
+
+        def poll():
+            response = client.get(url, params={"limit": 50},
+                                  headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            return response
+
+        record_queries(benchmark, benchmark(poll))
+
+
+class TestWritePaths:
+    """Join/leave, web send with fan-out and the inbound webhook"""
+
+    def test_join_leave(self, benchmark, client, layout):
+        group_id = 1
+        user_id = layout.outsider(group_id)
+
+        def join_leave():
+            joined = client.post(f"/api/groups/{group_id}/join/{user_id}")
+            assert joined.status_code == 200
+            left = client.post(f"/api/groups/{group_id}/leave/{user_id}")
+            assert left.status_code == 200
+            return left
+
+        response = benchmark.pedantic(join_leave, rounds=WRITE_ROUNDS,
+                                      iterations=1)
+        record_queries(benchmark, response)
+
+    def test_web_send(self, benchmark, client, db, layout):
+        group_id = 2
+        sender = layout.group_members(group_id)[0]
+
+        def send():
+            response = client.post(f"/api/groups/{group_id}/messages", json={
+                "content": "Benchmark message", "user_id": sender
+            })
+            assert response.status_code == 200
+            return response
+
+        response = benchmark.pedantic(
+            send, setup=lambda: drain_outbound(db), rounds=WRITE_ROUNDS,
+            iterations=1,
+        )
+        record_queries(benchmark, response)
+        benchmark.extra_info["fanout_recipients"] = layout.members - 1
+        drain_outbound(db)
+
+    def test_web_send_with_fanout_delivery(self, benchmark, client, db,
+                                           layout, fake_twilio):
+        """Send plus delivering the whole fan-out through fake Twilio"""
+        group_id = 3
+        sender = layout.group_members(group_id)[0]
+        drain_outbound(db)
+        delivered = len(fake_twilio.messages)
+
+        def send_and_deliver():
+            response = client.post(f"/api/groups/{group_id}/messages", json={
+                "content": "Benchmark fan-out", "user_id": sender
+            })
+            assert response.status_code == 200
+            return drain_outbound(db)
+
+        sent = benchmark.pedantic(send_and_deliver, rounds=WRITE_ROUNDS,
+                                  iterations=1)
+        assert sent == layout.members - 1
+        assert len(fake_twilio.messages) - delivered == (
+            WRITE_ROUNDS * (layout.members - 1)
+        )
+        benchmark.extra_info["fanout_recipients"] = sent
+
+    def test_webhook_ack(self, benchmark, client, db, layout, webhook_mode):
+        """Queue mode: store the SMS and answer Twilio"""
+        webhook_mode("queue")
+        groups = itertools.cycle(layout.group_ids)
+        body = "Benchmark SMS (queued)"
+
+        def webhook():
+            response = client.post("/api/sms/webhook",
+                                   data=webhook_form(layout, next(groups),
+                                                     body))
+            assert response.status_code == 200
+            return response
+
+        record_queries(benchmark, benchmark(webhook))
+        received = drain_inbound(db)
+        drain_outbound(db)
+        # Every stored SMS was routed into its group, not rejected
+        assert received and routed_messages(db, body) == received
+        assert db.query(InboundMessage).filter(
+            InboundMessage.body == body,
+            InboundMessage.message_id.is_(None),
+        ).count() == 0
+
+    def test_webhook_inline(self, benchmark, client, db, layout,
+                            webhook_mode):
+        """Inline mode: route and queue the fan-out inside the request"""
+        webhook_mode("inline")
+        groups = itertools.cycle(layout.group_ids)
+        body = "Benchmark SMS (inline)"
+
+        def webhook():
+            response = client.post("/api/sms/webhook",
+                                   data=webhook_form(layout, next(groups),
+                                                     body))
+            assert response.status_code == 200
+            assert response.json()["message"].startswith("Message sent to")
+            return response
+
+        response = benchmark.pedantic(
+            webhook, setup=lambda: drain_outbound(db), rounds=WRITE_ROUNDS,
+            iterations=1,
+        )
+        record_queries(benchmark, response)
+        drain_outbound(db)
+        assert routed_messages(db, body) == WRITE_ROUNDS
+
+    def test_inbound_worker_batch(self, benchmark, client, db, layout,
+                                  webhook_mode):
+        """Route a batch of queued SMS and deliver their fan-outs"""
+        webhook_mode("queue")
+        groups = itertools.cycle(layout.group_ids)
+        body = "Benchmark SMS (worker)"
+
+        def enqueue_batch():
+            for _ in range(WEBHOOK_BATCH):
+                client.post("/api/sms/webhook",
+                            data=webhook_form(layout, next(groups), body))
+
+        def process_batch():
+            routed = drain_inbound(db)
+            drain_outbound(db)
+            return routed
+
+        routed = benchmark.pedantic(process_batch, setup=enqueue_batch,
+                                    rounds=WRITE_ROUNDS, iterations=1)
+        # Claimed rows alone would also count SMS that failed to route
+        assert routed == WEBHOOK_BATCH
+        assert routed_messages(db, body) == WRITE_ROUNDS * WEBHOOK_BATCH
+        benchmark.extra_info["batch_size"] = WEBHOOK_BATCH
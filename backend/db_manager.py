@@ -236,10 +236,44 @@ class DatabaseManager:
             print(f"❌ Error running seed script: {e}")
             return False
 
+    def reconcile_member_counts(self):
+        """Repair drift between groups.member_count and user_groups"""
+        print("Reconciling group member counts...")
+        try:
+            conn = psycopg2.connect(self.database_url)
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE groups
+                SET member_count = counts.actual
+                FROM (
+                    SELECT g.id, count(ug.user_id) AS actual
+                    FROM groups g
+                    LEFT JOIN user_groups ug ON ug.group_id = g.id
+                    GROUP BY g.id
+                ) AS counts
+                WHERE counts.id = groups.id
+                  AND groups.member_count <> counts.actual
+                RETURNING groups.id, groups.member_count
+            """)
+            repaired = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            for group_id, count in repaired:
+                print(f"  Group {group_id}: member_count -> {count}")
+            print(f"✅ Reconciled {len(repaired)} group(s)")
+            return True
+            
+        except psycopg2.Error as e:
+            print(f"❌ Error reconciling member counts: {e}")
+            return False
+
 def main():
     parser = argparse.ArgumentParser(description="Database management utility")
     parser.add_argument("command", choices=[
-        "setup", "migrate", "reset", "seed", "create-migration", "full-setup"
+        "setup", "migrate", "reset", "seed", "create-migration", "full-setup",
+        "reconcile-counts"
     ], help="Command to run")
     parser.add_argument("-m", "--message", help="Migration message (for create-migration)")
     
@@ -270,6 +304,10 @@ def main():
         success = db.create_migration(args.message)
         sys.exit(0 if success else 1)
     
+    elif args.command == "reconcile-counts":
+        success = db.reconcile_member_counts()
+        sys.exit(0 if success else 1)
+    
     elif args.command == "full-setup":
         print("🚀 Running full database setup...")
         steps = [
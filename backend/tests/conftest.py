@@ -1,13 +1,29 @@
+import os
+
+# Background workers would drain the dev database, not the test database;
+# tests drain the outbound queue explicitly with dispatch_pending(db)
+os.environ.setdefault("OUTBOUND_QUEUE_WORKERS", "0")
+os.environ.setdefault("INBOUND_QUEUE_WORKERS", "0")
+# Route webhooks inside the request so tests can assert on the outcome;
+# queue mode is covered explicitly in test_message_delivery.py
+os.environ.setdefault("SMS_WEBHOOK_MODE", "inline")
+# Deliver events in-process after commit instead of via LISTEN/NOTIFY
+os.environ.setdefault("EVENTS_BACKEND", "local")
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
-from app.db.database import Base, get_db
+from app.db import query_stats
+from app.db.database import Base, get_db, get_read_db
 from app.main import app
 from app.models.models import User, Group, Message, user_groups
 from app.models.phone_pool import PhoneNumber, OTPVerification
-import os
+from app.models.outbound import OutboundMessage
+from app.models.inbound import InboundMessage
+from app.services import membership_cache, routing_cache
+from tests.fake_twilio import FakeTwilioServer
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -18,8 +34,14 @@ SQLALCHEMY_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "postgresql://smsuser:s
 
 # Create engine and session
 engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+query_stats.instrument(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def reset_caches():
+    """Drop cached routes and memberships from another database/test"""
+    routing_cache.pool_numbers.invalidate()
+    membership_cache.group_members.invalidate()
+
 def override_get_db():
     """Override the get_db dependency for tests"""
     try:
@@ -61,6 +83,10 @@ def clean_database(db):
     def clean_all_test_data():
         """Complete cleanup of all test data"""
         try:
+            # Delete queued SMS (they reference messages)
+            db.query(OutboundMessage).delete(synchronize_session=False)
+            db.query(InboundMessage).delete(synchronize_session=False)
+            
             # Delete all messages (no foreign key constraints)
             db.query(Message).delete(synchronize_session=False)
             
@@ -86,6 +112,8 @@ def clean_database(db):
     
     # Clean before test
     clean_all_test_data()
+    # Drop anything cached by an earlier test
+    reset_caches()
     
     yield
     
@@ -96,9 +124,13 @@ def clean_database(db):
 def client(clean_database):
     """Create test client"""
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     os.environ["MOCK_SMS"] = "true"
     
     with TestClient(app) as test_client:
+        # Startup warmed the routing cache through SessionLocal, i.e. from
+        # the dev database rather than the test database
+        reset_caches()
         yield test_client
     
     # Clear dependency overrides after test
@@ -120,4 +152,23 @@ def test_group(db):
     db.add(group)
     db.commit()
     db.refresh(group)
-    return group
\ No newline at end of file
+    return group
+
+@pytest.fixture
+def fake_twilio():
+    """Local fake Twilio Messages API on a random port"""
+    server = FakeTwilioServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def query_counter():
+    """Collect every SQL statement sent through the test engine"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
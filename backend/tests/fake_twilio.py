@@ -0,0 +1,142 @@
+"""
+Local fake of the Twilio Messages API.
+
+Accepts ``POST /2010-04-01/Accounts/{sid}/Messages.json`` and answers like
+Twilio does, with optional latency and error injection. Point the backend
+at it with ``TWILIO_API_BASE_URL=http://127.0.0.1:<port>`` and
+``MOCK_SMS=false`` (any account SID/auth token will do).
+
+Run standalone for load tests:
+    python -m tests.fake_twilio --port 8099 --latency 0.05
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+
+MESSAGES_PATH = re.compile(r"^/2010-04-01/Accounts/(\w+)/Messages\.json$")
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can reuse keep-alive connections
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.record_connection()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        match = MESSAGES_PATH.match(self.path)
+        if not match:
+            return self._send(404, {"message": "Not found", "status": 404})
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.should_fail():
+            return self._send(
+                429, {"code": 20429, "message": "Too Many Requests",
+                      "status": 429}
+            )
+
+        message = {
+            "sid": "SM" + uuid.uuid4().hex,
+            "account_sid": match.group(1),
+            "to": form.get("To", [None])[0],
+            "from": form.get("From", [None])[0],
+            "body": form.get("Body", [None])[0],
+            "status": "queued",
+            "num_segments": "1",
+            "direction": "outbound-api",
+        }
+        self.server.record_message(message)
+        self._send(201, message)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTwilioServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0,
+                 error_rate=0.0):
+        super().__init__((host, port), FakeTwilioHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def record_message(self, message):
+        with self._lock:
+            self.messages.append(message)
+
+    def should_fail(self):
+        # Deterministic: every 1/error_rate-th request is rejected
+        with self._lock:
+            self._requests += 1
+            if not self.error_rate:
+                return False
+            return self._requests % round(1 / self.error_rate) == 0
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="fake-twilio", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Twilio Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds to sleep per request")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    server = FakeTwilioServer(args.host, args.port, args.latency,
+                              args.error_rate)
+    print(f"Fake Twilio listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
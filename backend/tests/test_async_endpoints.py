@@ -0,0 +1,158 @@
+"""
+Async endpoint tests
+
+The DB_ASYNC handlers must behave exactly like their sync twins. They are
+mounted on a bare app here with an AsyncSession bound to the test
+database.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.api import async_endpoints
+from app.db.database import get_async_db, get_async_read_db
+from app.models.outbound import OutboundMessage
+from app.services import membership_cache
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+async_engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL.replace(
+        "postgresql://", "postgresql+asyncpg://", 1
+    ),
+    poolclass=NullPool,
+)
+AsyncTestingSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture
+def async_client(client):
+    """Async routers on a bare app; ``client`` sets up data synchronously"""
+    app = FastAPI()
+    app.include_router(async_endpoints.groups_router, prefix="/api/groups")
+    app.include_router(async_endpoints.sms_router, prefix="/api/sms")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _group_with_members(client, count=3):
+    client.post("/api/admin/phone-numbers",
+                json={"phone_number": "+15550007000"})
+    group_id = client.post(
+        "/api/groups/", json={"name": "Async Group"}
+    ).json()["id"]
+    user_ids = []
+    for i in range(count):
+        user_id = client.post("/api/users/", json={
+            "name": f"Async {i}", "phone_number": f"+1555700000{i}"
+        }).json()["id"]
+        client.post(f"/api/groups/{group_id}/join/{user_id}")
+        user_ids.append(user_id)
+    return group_id, user_ids
+
+
+class TestAsyncEndpoints:
+    """Async handlers match the sync ones"""
+
+    def test_send_message_and_history(self, client, async_client, db):
+        group_id, user_ids = _group_with_members(client)
+
+        response = async_client.post(
+            f"/api/groups/{group_id}/messages",
+            json={"content": "Async hello", "user_id": user_ids[0]}
+        )
+        assert response.status_code == 200
+        assert response.json()["user_name"] == "Async 0"
+
+        queued = db.query(OutboundMessage).all()
+        assert sorted(q.to_number for q in queued) == [
+            "+15557000001", "+15557000002"
+        ]
+        assert all(q.from_number == "+15550007000" for q in queued)
+
+        url = f"/api/groups/{group_id}/messages"
+        assert async_client.get(url).json() == client.get(url).json()
+        etag = async_client.get(url).headers["ETag"]
+        assert async_client.get(
+            url, headers={"If-None-Match": etag}
+        ).status_code == 304
+
+    def test_send_message_requires_membership(self, client, async_client):
+        group_id, _ = _group_with_members(client, 1)
+        outsider = client.post("/api/users/", json={
+            "name": "Outsider", "phone_number": "+15557009999"
+        }).json()["id"]
+
+        response = async_client.post(
+            f"/api/groups/{group_id}/messages",
+            json={"content": "Let me in", "user_id": outsider}
+        )
+        assert response.status_code == 403
+
+    def test_send_message_checks_membership_from_cache(self, client,
+                                                       async_client, db):
+        group_id, user_ids = _group_with_members(client)
+        membership_cache.group_members.members(db, group_id)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute",
+                     record)
+        try:
+            response = async_client.post(
+                f"/api/groups/{group_id}/messages",
+                json={"content": "Cached", "user_id": user_ids[0]}
+            )
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute",
+                         record)
+
+        assert response.status_code == 200
+        # Membership and fan-out recipients both came from the cache
+        assert not any("user_groups" in s for s in statements)
+
+    def test_search_matches_sync(self, client, async_client):
+        for name in ("book", "The Book Club", "Cooking"):
+            client.post("/api/groups/", json={"name": name})
+
+        url = "/api/groups/?search=book"
+        assert async_client.get(url).json() == client.get(url).json()
+
+    def test_webhook_routes_by_pool_number(self, client, async_client, db):
+        group_id, user_ids = _group_with_members(client)
+
+        response = async_client.post("/api/sms/webhook", data={
+            "From": "+15557000001", "Body": "Texted in",
+            "To": "+15550007000"
+        })
+        assert response.json() == {
+            "message": "Message sent to Async Group group"
+        }
+        assert sorted(
+            q.to_number for q in db.query(OutboundMessage).all()
+        ) == ["+15557000000", "+15557000002"]
+
+    def test_webhook_skips_duplicate_message_sid(self, client, async_client,
+                                                 db):
+        _group_with_members(client)
+        sms = {"From": "+15557000001", "Body": "Twice",
+               "To": "+15550007000", "MessageSid": "SM" + "c" * 32}
+
+        async_client.post("/api/sms/webhook", data=sms)
+        response = async_client.post("/api/sms/webhook", data=sms)
+
+        assert response.json() == {"message": "Duplicate message ignored"}
+        assert db.query(OutboundMessage).count() == 2
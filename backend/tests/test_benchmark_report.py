@@ -0,0 +1,71 @@
+"""
+Benchmark report comparison tests
+"""
+from benchmarks.report import compare, flatten, percentile, summarize
+
+
+def _pytest_benchmark(median, ops, db_queries):
+    return {"benchmarks": [{
+        "name": "test_group_search",
+        "stats": {"median": median, "mean": median, "ops": ops},
+        "extra_info": {"db_queries": db_queries},
+    }]}
+
+
+def _loadgen(p95_ms, rps, errors=0):
+    return {"kind": "loadgen", "scenarios": {
+        "search": {"requests": 100, "errors": errors, "rps": rps,
+                   "p95_ms": p95_ms},
+    }}
+
+
+class TestSummaries:
+    """Latency percentiles and throughput"""
+
+    def test_percentiles_and_rps(self):
+        latencies = [i / 1000 for i in range(1, 101)]
+
+        summary = summarize(latencies, errors=2, elapsed=2.0)
+
+        assert summary["requests"] == 100
+        assert summary["rps"] == 50.0
+        assert summary["p50_ms"] == 50.0
+        assert summary["p95_ms"] == 95.0
+        assert summary["max_ms"] == 100.0
+        assert percentile([], 0.5) == 0.0
+
+
+class TestCompare:
+    """Regressions are flagged in the metric's worse direction only"""
+
+    def test_flatten_pytest_benchmark_report(self):
+        metrics = flatten(_pytest_benchmark(0.002, 500.0, 1))
+
+        assert metrics == {
+            "test_group_search.median_ms": 2.0,
+            "test_group_search.mean_ms": 2.0,
+            "test_group_search.ops": 500.0,
+            "test_group_search.db_queries": 1,
+        }
+
+    def test_slower_and_more_queries_regress(self):
+        rows = compare(_pytest_benchmark(0.002, 500.0, 1),
+                       _pytest_benchmark(0.003, 333.0, 2))
+
+        assert {row["metric"] for row in rows if row["regression"]} == {
+            "test_group_search.median_ms", "test_group_search.mean_ms",
+            "test_group_search.ops", "test_group_search.db_queries",
+        }
+
+    def test_improvement_and_noise_do_not_regress(self):
+        rows = compare(_loadgen(p95_ms=20.0, rps=100.0),
+                       _loadgen(p95_ms=10.0, rps=95.0), threshold=0.1)
+
+        assert not any(row["regression"] for row in rows)
+
+    def test_new_errors_regress(self):
+        rows = compare(_loadgen(20.0, 100.0), _loadgen(20.0, 100.0, errors=3))
+
+        assert [row["metric"] for row in rows if row["regression"]] == [
+            "search.errors"
+        ]
@@ -13,6 +13,7 @@ Tests the entire user journey from phone registration to messaging:
 import pytest
 from unittest.mock import patch, MagicMock
 import os
+from app.services.outbound_queue import dispatch_pending
 
 # Force mock mode for all tests
 os.environ['MOCK_SMS'] = 'true'
@@ -247,6 +248,9 @@ class TestMessaging:
         assert message_data["content"] == "Hello from web! TEST"
         assert message_data["user_name"] == "Alice TEST"
         
+        # SMS fan-out is queued; drain it as the worker pool would
+        dispatch_pending(db)
+        
         # Verify SMS was sent to Bob (logged in mock mode)
         log_calls = [call.args[0] for call in mock_logger.info.call_args_list]
         
@@ -0,0 +1,64 @@
+"""
+Connection pool tests
+
+Pool sizing is configurable and checkout waits are measured.
+"""
+import pytest
+from sqlalchemy import create_engine, exc
+
+from app.db import pool as db_pool
+from app.db.pool import InstrumentedQueuePool, engine_options, pool_metrics
+
+
+class TestPoolConfiguration:
+    """engine_options follows the DB_* settings"""
+
+    def test_queue_pool_options(self, monkeypatch):
+        monkeypatch.setattr(db_pool, "PGBOUNCER", False)
+        monkeypatch.setattr(db_pool, "POOL_SIZE", 20)
+        monkeypatch.setattr(db_pool, "MAX_OVERFLOW", 5)
+
+        options = engine_options()
+        assert options["poolclass"] is InstrumentedQueuePool
+        assert options["pool_size"] == 20
+        assert options["max_overflow"] == 5
+        assert options["pool_pre_ping"] is False
+
+    def test_pgbouncer_mode_disables_local_pool(self, monkeypatch):
+        monkeypatch.setattr(db_pool, "PGBOUNCER", True)
+
+        options = engine_options(async_driver=True)
+        assert options["poolclass"].__name__ == "NullPool"
+        assert options["connect_args"]["statement_cache_size"] == 0
+        assert "connect_args" not in engine_options()
+
+
+class TestPoolMetrics:
+    """Occupancy, overflow and wait time are reported"""
+
+    def test_checkout_metrics_and_timeouts(self):
+        engine = create_engine(
+            "sqlite://", poolclass=InstrumentedQueuePool,
+            pool_size=1, max_overflow=1, pool_timeout=0.05,
+        )
+        first = engine.connect()
+        second = engine.connect()
+        metrics = pool_metrics(engine.pool)
+        assert metrics["checked_out"] == 2
+        assert metrics["overflow"] == 1
+        assert metrics["checkouts"] == 2
+
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        metrics = pool_metrics(engine.pool)
+        assert metrics["timeouts"] == 1
+        assert metrics["wait_seconds_max"] >= 0.05
+
+        first.close()
+        second.close()
+        assert pool_metrics(engine.pool)["checked_out"] == 0
+
+    def test_pool_endpoint(self, client):
+        response = client.get("/api/admin/db/pool")
+        assert response.status_code == 200
+        assert "checked_out" in response.json()["primary"]
@@ -0,0 +1,227 @@
+"""
+Live update tests
+
+New messages are pushed to browsers over a per-group SSE stream, and
+events reach every worker through Postgres LISTEN/NOTIFY.
+"""
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from app.models.models import Message
+from app.services import events
+from app.services.events import EventBus, PgEventListener, sse_stream
+from tests.conftest import SQLALCHEMY_DATABASE_URL, engine
+
+
+class TestEventBus:
+    """Publishing reaches every subscriber of the topic"""
+
+    def test_publish_from_another_thread(self):
+        bus = EventBus()
+
+        async def scenario():
+            first = bus.subscribe("group:1")
+            second = bus.subscribe("group:1")
+            other = bus.subscribe("group:2")
+            thread = threading.Thread(
+                target=bus.publish,
+                args=("group:1", "message_created", {"id": 7}),
+            )
+            thread.start()
+            thread.join()
+            received = [await first.get(1), await second.get(1)]
+            assert other.queue.empty()
+            return received
+
+        received = asyncio.run(scenario())
+        assert received == [
+            {"event": "message_created", "data": {"id": 7}}
+        ] * 2
+
+    def test_slow_subscriber_is_dropped(self):
+        bus = EventBus()
+
+        async def scenario():
+            subscription = events.Subscription(bus, "group:1", maxsize=2)
+            bus._subscribers["group:1"] = {subscription}
+            for i in range(3):
+                bus.publish("group:1", "message_created", {"id": i})
+            await asyncio.sleep(0)
+            return subscription
+
+        subscription = asyncio.run(scenario())
+        assert subscription.closed
+        assert bus.subscriber_count() == 0
+
+    def test_sse_stream_frames(self):
+        async def scenario():
+            stream = sse_stream("group:9", heartbeat=0.01)
+            ready = await stream.__anext__()
+            heartbeat = await stream.__anext__()
+            events.bus.publish(
+                "group:9", "message_created", {"id": 3, "content": "Hi"}
+            )
+            frame = await stream.__anext__()
+            await stream.aclose()
+            return ready, heartbeat, frame
+
+        ready, heartbeat, frame = asyncio.run(scenario())
+        assert "event: ready" in ready
+        assert heartbeat == ": keep-alive\n\n"
+        lines = frame.strip().split("\n")
+        assert lines[0] == "event: message_created"
+        assert lines[1] == "id: 3"
+        assert json.loads(lines[2][len("data: "):]) == {
+            "id": 3, "content": "Hi"
+        }
+        # The subscription is released when the stream closes
+        assert events.bus.subscriber_count("group:9") == 0
+
+
+class TestGroupStream:
+    """Committed messages are published to the group's stream"""
+
+    @patch('app.services.events.bus.publish')
+    def test_send_message_publishes_event(self, mock_publish, client):
+        group_id = client.post(
+            "/api/groups/", json={"name": "Live Group"}
+        ).json()["id"]
+        user_id = client.post("/api/users/", json={
+            "name": "Streamer", "phone_number": "+15556000000"
+        }).json()["id"]
+        client.post(f"/api/groups/{group_id}/join/{user_id}")
+        mock_publish.reset_mock()
+
+        response = client.post(
+            f"/api/groups/{group_id}/messages",
+            json={"content": "Pushed", "user_id": user_id}
+        )
+        mock_publish.assert_called_once()
+        topic, event, data = mock_publish.call_args[0]
+        assert topic == f"group:{group_id}"
+        assert event == "message_created"
+        assert data == response.json()
+
+    @patch('app.services.events.bus.publish')
+    def test_sms_webhook_publishes_event(self, mock_publish, client):
+        group_id = client.post(
+            "/api/groups/", json={"name": "Texting Group"}
+        ).json()["id"]
+        user_id = client.post("/api/users/", json={
+            "name": "Texter", "phone_number": "+15556000001"
+        }).json()["id"]
+        client.post(f"/api/groups/{group_id}/join/{user_id}")
+        mock_publish.reset_mock()
+
+        client.post("/api/sms/webhook", data={
+            "From": "+15556000001", "Body": "By SMS", "To": "+15550009999"
+        })
+        mock_publish.assert_called_once()
+        topic, event, data = mock_publish.call_args[0]
+        assert topic == f"group:{group_id}"
+        assert data["content"] == "By SMS"
+        assert data["user_name"] == "Texter"
+
+    def test_stream_unknown_group_is_404(self, client):
+        assert client.get("/api/groups/999999/stream").status_code == 404
+
+
+class TestEventNotifications:
+    """Endpoints emit events only for committed changes"""
+
+    def _published(self, mock_publish):
+        return [c[0][1:] for c in mock_publish.call_args_list]
+
+    @patch('app.services.events.bus.publish')
+    def test_join_and_leave_emit_membership_events(
+        self, mock_publish, client
+    ):
+        group_id = client.post(
+            "/api/groups/", json={"name": "Event Group"}
+        ).json()["id"]
+        user_id = client.post("/api/users/", json={
+            "name": "Joiner", "phone_number": "+15556000002"
+        }).json()["id"]
+
+        client.post(f"/api/groups/{group_id}/join/{user_id}")
+        client.post(f"/api/groups/{group_id}/leave/{user_id}")
+        # A rejected second leave changes nothing, so emits nothing
+        client.post(f"/api/groups/{group_id}/leave/{user_id}")
+
+        membership = [
+            (event, data) for event, data in self._published(mock_publish)
+            if event.startswith("member_")
+        ]
+        expected = {"group_id": group_id, "user_id": user_id}
+        assert membership == [
+            ("member_joined", expected), ("member_left", expected)
+        ]
+
+    @patch('app.services.events.bus.publish')
+    def test_group_creation_emits_phone_assigned(self, mock_publish, client):
+        client.post("/api/admin/phone-numbers",
+                    json={"phone_number": "+15550003000"})
+        group_id = client.post(
+            "/api/groups/", json={"name": "Numbered Group"}
+        ).json()["id"]
+
+        assert ("phone_assigned", {
+            "group_id": group_id, "phone_number": "+15550003000"
+        }) in self._published(mock_publish)
+
+    @patch('app.services.events.bus.publish')
+    def test_rolled_back_events_are_dropped(self, mock_publish, db,
+                                            test_user, test_group):
+        message = Message(content="Never", user_id=test_user.id,
+                          group_id=test_group.id)
+        db.add(message)
+        db.flush()
+        events.notify(db, events.group_topic(test_group.id),
+                      "message_created", {"id": message.id})
+        db.rollback()
+        db.commit()
+
+        mock_publish.assert_not_called()
+
+    def test_oversized_payload_keeps_only_ids(self):
+        payload = json.loads(events._encode(
+            "group:1", "message_created",
+            {"id": 5, "group_id": 1, "content": "x" * 10000}
+        ))
+        assert payload == {
+            "topic": "group:1", "event": "message_created",
+            "data": {"id": 5, "group_id": 1},
+        }
+
+
+class TestPostgresEventListener:
+    """NOTIFY from any connection reaches this worker's subscribers"""
+
+    def test_listener_republishes_notifications(self):
+        target = EventBus()
+        listener = PgEventListener(
+            dsn=SQLALCHEMY_DATABASE_URL, channel="test_events",
+            target=target,
+        )
+
+        async def scenario():
+            await listener.start()
+            subscription = target.subscribe("group:3")
+            payload = events._encode(
+                "group:3", "member_joined", {"group_id": 3, "user_id": 8}
+            )
+            with engine.begin() as conn:
+                conn.execute(text("SELECT pg_notify('test_events', :p)"),
+                             {"p": payload})
+            try:
+                return await subscription.get(timeout=5)
+            finally:
+                await listener.stop()
+
+        assert asyncio.run(scenario()) == {
+            "event": "member_joined", "data": {"group_id": 3, "user_id": 8}
+        }
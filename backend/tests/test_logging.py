@@ -0,0 +1,182 @@
+"""
+Logging tests
+
+The request middleware runs against a bare app so only it is exercised;
+the queue pipeline is checked with its own queue and listener.
+"""
+import io
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueListener
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.logging import (
+    JsonFormatter, LogQueueHandler, console_handler_for, file_handler,
+    log_file_name
+)
+from app.core.request_logging import (
+    RequestLoggingMiddleware, parse_sample_rates
+)
+
+LOGGER = "app.core.request_logging"
+
+
+def _client(**options):
+    app = FastAPI()
+
+    @app.post("/api/sms/webhook")
+    def webhook(payload: dict):
+        return payload
+
+    @app.get("/api/groups/")
+    def groups():
+        return []
+
+    @app.get("/api/boom")
+    def boom():
+        raise HTTPException(status_code=503, detail="down")
+
+    app.add_middleware(RequestLoggingMiddleware, **options)
+    return TestClient(app)
+
+
+def _lines(caplog):
+    return [r.getMessage() for r in caplog.records if r.name == LOGGER]
+
+
+class TestRequestLogging:
+    """Sampling, lazy details and timing"""
+
+    def test_logs_request_and_sets_process_time(self, caplog):
+        caplog.set_level(logging.INFO, logger=LOGGER)
+        response = _client().get("/api/groups/")
+
+        assert float(response.headers["X-Process-Time"]) >= 0
+        lines = _lines(caplog)
+        assert lines[0] == "[IN] GET /api/groups/ - Client: testclient"
+        assert lines[1].startswith("[OUT] GET /api/groups/ - Status: 200")
+        assert not any("Body" in line for line in lines)
+
+    def test_route_sample_rates(self, caplog):
+        caplog.set_level(logging.INFO, logger=LOGGER)
+        client = _client(route_rates="/api/sms=0,/api/sms/webhook=0.5",
+                         rng=lambda: 0.7)
+
+        client.post("/api/sms/webhook", json={"Body": "hi"})
+        assert _lines(caplog) == []
+
+        client.get("/api/groups/")
+        assert len(_lines(caplog)) == 2
+
+    def test_server_errors_logged_when_unsampled(self, caplog):
+        caplog.set_level(logging.INFO, logger=LOGGER)
+        response = _client(sample_rate=0).get("/api/boom")
+
+        assert response.status_code == 503
+        [line] = _lines(caplog)
+        assert line.startswith("[OUT] GET /api/boom - Status: 503")
+
+    def test_debug_logs_masked_body(self, caplog):
+        caplog.set_level(logging.DEBUG, logger=LOGGER)
+        response = _client().post(
+            "/api/sms/webhook?source=test",
+            json={"phone_number": "+15550001111", "otp_code": "123456"},
+            headers={"Authorization": "Bearer secret"},
+        )
+
+        assert response.json()["otp_code"] == "123456"
+        lines = _lines(caplog)
+        assert "   Query params: source=test" in lines
+        assert not any("secret" in line for line in lines)
+        assert ('   Body: {"phone_number": "+15550001111", '
+                '"otp_code": "***"}') in lines
+
+    def test_parse_sample_rates_longest_prefix_first(self):
+        assert parse_sample_rates(" /api=0.5, /api/sms/webhook=0.01,bad") == [
+            ("/api/sms/webhook", 0.01), ("/api", 0.5)
+        ]
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class TestLogPipeline:
+    """Records go through a queue to a writer thread"""
+
+    def _log_through_queue(self, formatter, log):
+        log_queue = queue.SimpleQueue()
+        target = ListHandler()
+        target.setFormatter(formatter)
+        listener = QueueListener(log_queue, target)
+        test_logger = logging.getLogger("tests.pipeline")
+        test_logger.propagate = False
+        handler = LogQueueHandler(log_queue)
+        test_logger.addHandler(handler)
+        listener.start()
+        try:
+            log(test_logger)
+        finally:
+            listener.stop()
+            test_logger.removeHandler(handler)
+        return target.lines
+
+    def test_text_lines_render_args(self):
+        lines = self._log_through_queue(
+            logging.Formatter("%(levelname)s %(message)s"),
+            lambda log: log.warning("Sent to %s members", 12),
+        )
+        assert lines == ["WARNING Sent to 12 members"]
+
+    def test_json_lines_keep_tracebacks(self):
+        def log(test_logger):
+            try:
+                raise ValueError("bad payload")
+            except ValueError:
+                test_logger.exception("Inbound SMS %s failed", 7)
+
+        [line] = self._log_through_queue(JsonFormatter(), log)
+        entry = json.loads(line)
+        assert entry["level"] == "ERROR"
+        assert entry["logger"] == "tests.pipeline"
+        assert entry["message"] == "Inbound SMS 7 failed"
+        assert "ValueError: bad payload" in entry["exc_info"]
+
+    def test_unencodable_text_is_escaped_not_dropped(self):
+        stream = io.TextIOWrapper(io.BytesIO(), encoding="ascii")
+        handler = console_handler_for(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        # A lone surrogate cannot be written even as UTF-8
+        handler.emit(logging.makeLogRecord({"msg": "Sent \U0001f680 \udc80"}))
+        stream.flush()
+
+        assert stream.buffer.getvalue() == "Sent \U0001f680 \\udc80\n".encode()
+        assert file_handler.errors == "backslashreplace"
+
+
+class TestLogFile:
+    """Several workers must not rotate the same file"""
+
+    def test_single_process_uses_app_log(self, monkeypatch):
+        monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+        monkeypatch.setenv("WEB_CONCURRENCY", "1")
+        assert log_file_name() == "app.log"
+
+    def test_workers_log_to_their_own_file(self, monkeypatch, tmp_path):
+        monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        assert log_file_name() == f"app.{os.getpid()}.log"
+
+        monkeypatch.delenv("WEB_CONCURRENCY")
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        assert log_file_name() == f"app.{os.getpid()}.log"
@@ -0,0 +1,465 @@
+"""
+Outbound SMS delivery tests
+
+Covers the durable fan-out queue: endpoints only enqueue, workers send,
+and the inbound queue behind the Twilio webhook.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from twilio.rest import Client
+
+from app.api.sms import EMPTY_TWIML
+from app.models.inbound import InboundMessage, InboundStatus
+from app.models.models import Group, Message, User, user_groups
+from app.models.outbound import OutboundMessage, OutboundStatus
+from app.services import inbound_queue
+from app.services.membership_cache import MembershipCache
+from app.services.outbound_queue import (
+    dispatch_pending, enqueue_group_fanout
+)
+from app.services.rate_limiter import SenderRateScheduler
+from app.services.twilio_transport import (
+    PooledTwilioHttpClient, SenderConcurrencyLimiter
+)
+
+os.environ['MOCK_SMS'] = 'true'
+
+
+def _setup_group_with_members(client, member_count=3):
+    client.post("/api/admin/phone-numbers",
+                json={"phone_number": "+15550001000", "twilio_sid": "PN1"})
+    group_id = client.post(
+        "/api/groups", json={"name": "Queue TEST"}
+    ).json()["id"]
+    user_ids = []
+    for i in range(member_count):
+        user_id = client.post(
+            "/api/users",
+            json={"name": f"Member {i}", "phone_number": f"+1555000200{i}"}
+        ).json()["id"]
+        client.post(f"/api/groups/{group_id}/join/{user_id}")
+        user_ids.append(user_id)
+    return group_id, user_ids
+
+
+class TestOutboundQueue:
+    """Group fan-out goes through the outbound_messages queue"""
+
+    @patch('app.services.sms_service.send_sms')
+    def test_send_message_enqueues_without_sending(
+        self, mock_send, client, db
+    ):
+        group_id, user_ids = _setup_group_with_members(client)
+
+        response = client.post(
+            f"/api/groups/{group_id}/messages",
+            json={"content": "Queued hello", "user_id": user_ids[0]}
+        )
+        assert response.status_code == 200
+        mock_send.assert_not_called()
+
+        queued = db.query(OutboundMessage).filter(
+            OutboundMessage.message_id == response.json()["id"]
+        ).all()
+        assert sorted(q.to_number for q in queued) == [
+            "+15550002001", "+15550002002"
+        ]
+        assert all(q.status == OutboundStatus.PENDING for q in queued)
+        assert all(q.from_number == "+15550001000" for q in queued)
+        assert all(q.body == "[Queue TEST] Member 0: Queued hello"
+                   for q in queued)
+
+    def test_fan_out_is_a_single_insert(self, client, db, query_counter):
+        group_id, user_ids = _setup_group_with_members(client, 5)
+        query_counter.clear()
+
+        response = client.post(
+            f"/api/groups/{group_id}/messages",
+            json={"content": "Broadcast", "user_id": user_ids[0]}
+        )
+        assert response.status_code == 200
+
+        inserts = [s for s in query_counter
+                   if s.startswith("INSERT INTO outbound_messages")]
+        assert len(inserts) == 1
+        assert db.query(OutboundMessage).count() == 4
+        assert {q.recipient_user_id for q in db.query(OutboundMessage)} == (
+            set(user_ids[1:])
+        )
+
+    def test_large_fan_out_is_a_single_insert(self, db, query_counter):
+        # Beyond the 1000-row pages an executemany would be split into
+        group = Group(name="Large Group", member_count=1201)
+        users = [User(name=f"Large {i}", phone_number=f"+1555700{i:04d}")
+                 for i in range(1201)]
+        db.add_all([group] + users)
+        db.flush()
+        db.execute(user_groups.insert(), [
+            {"user_id": user.id, "group_id": group.id} for user in users
+        ])
+        db.commit()
+        query_counter.clear()
+
+        queued = enqueue_group_fanout(db, group.id, users[0].id, "Hello all",
+                                      from_number="+15550001000")
+        db.commit()
+
+        inserts = [s for s in query_counter
+                   if s.startswith("INSERT INTO outbound_messages")]
+        assert len(inserts) == 1
+        assert queued == 1200
+        assert db.query(OutboundMessage).filter(
+            OutboundMessage.recipient_user_id == users[0].id
+        ).count() == 0
+        row = db.query(OutboundMessage).filter(
+            OutboundMessage.recipient_user_id == users[-1].id
+        ).one()
+        assert (row.to_number, row.from_number, row.body,
+                row.status) == (users[-1].phone_number, "+15550001000",
+                                "Hello all", OutboundStatus.PENDING)
+
+    def test_dispatch_pending_marks_rows_sent(self, client, db):
+        group_id, user_ids = _setup_group_with_members(client)
+        client.post(
+            f"/api/groups/{group_id}/messages",
+            json={"content": "Deliver me", "user_id": user_ids[0]}
+        )
+
+        assert dispatch_pending(db) == 2
+        assert dispatch_pending(db) == 0
+
+        db.expire_all()
+        statuses = {q.status for q in db.query(OutboundMessage).all()}
+        assert statuses == {OutboundStatus.SENT}
+
+    @patch('app.services.sms_service.send_sms')
+    def test_failed_send_is_retried_with_backoff(self, mock_send, client, db):
+        mock_send.side_effect = RuntimeError("Twilio unavailable")
+        group_id, user_ids = _setup_group_with_members(client, 2)
+        client.post(
+            f"/api/groups/{group_id}/messages",
+            json={"content": "Try again", "user_id": user_ids[0]}
+        )
+
+        assert dispatch_pending(db) == 1
+
+        db.expire_all()
+        row = db.query(OutboundMessage).one()
+        assert row.status == OutboundStatus.PENDING
+        assert row.attempts == 1
+        assert "Twilio unavailable" in row.last_error
+        assert row.available_at > row.claimed_at
+
+        # Backoff keeps the row out of the next claim
+        assert dispatch_pending(db) == 0
+
+    def test_sms_webhook_enqueues_fan_out(self, client, db):
+        group_id, user_ids = _setup_group_with_members(client)
+
+        response = client.post(
+            "/api/sms/webhook",
+            data={"From": "+15550002001", "Body": "From my phone",
+                  "To": "+15550001000"}
+        )
+        assert response.status_code == 200
+
+        queued = db.query(OutboundMessage).all()
+        assert sorted(q.to_number for q in queued) == [
+            "+15550002000", "+15550002002"
+        ]
+
+
+class TestMembershipCache:
+    """Fan-out reads (user_id, phone) pairs from the membership cache"""
+
+    def test_warm_fan_out_skips_user_groups(self, client, db,
+                                            query_counter):
+        group_id, user_ids = _setup_group_with_members(client, 4)
+        client.post(f"/api/groups/{group_id}/messages",
+                    json={"content": "Warm up", "user_id": user_ids[0]})
+        query_counter.clear()
+
+        client.post(f"/api/groups/{group_id}/messages",
+                    json={"content": "Cached", "user_id": user_ids[1]})
+        assert not any("user_groups" in s for s in query_counter)
+        cached = db.query(OutboundMessage).filter(
+            OutboundMessage.body.like("%Cached")
+        ).all()
+        assert {q.recipient_user_id for q in cached} == (
+            {user_ids[0]} | set(user_ids[2:])
+        )
+
+    def test_join_and_leave_refresh_members(self, client, db):
+        group_id, user_ids = _setup_group_with_members(client, 2)
+        client.post(f"/api/groups/{group_id}/messages",
+                    json={"content": "Before", "user_id": user_ids[0]})
+        newcomer = client.post("/api/users", json={
+            "name": "Newcomer", "phone_number": "+15550002999"
+        }).json()["id"]
+        client.post(f"/api/groups/{group_id}/join/{newcomer}")
+        client.post(f"/api/groups/{group_id}/leave/{user_ids[1]}")
+
+        client.post(f"/api/groups/{group_id}/messages",
+                    json={"content": "After", "user_id": user_ids[0]})
+        after = db.query(OutboundMessage).filter(
+            OutboundMessage.body.like("%After")
+        ).all()
+        assert [q.to_number for q in after] == ["+15550002999"]
+
+    def test_lru_eviction_and_ttl(self, client, db):
+        group_ids = [
+            client.post("/api/groups", json={"name": f"LRU {i}"}).json()["id"]
+            for i in range(3)
+        ]
+        clock = FakeClock()
+        cache = MembershipCache(ttl=10, max_groups=2, clock=clock)
+        for group_id in group_ids:
+            cache.members(db, group_id)
+        assert list(cache._entries) == group_ids[1:]
+
+        clock.now = 11.0
+        assert cache._get(group_ids[2]) is None
+
+
+class TestInboundQueue:
+    """SMS_WEBHOOK_MODE=queue: store, acknowledge, route in a worker"""
+
+    @pytest.fixture(autouse=True)
+    def queue_mode(self, monkeypatch):
+        monkeypatch.setattr(inbound_queue, "WEBHOOK_MODE", "queue")
+
+    def test_webhook_acknowledges_with_empty_twiml(self, client, db):
+        _setup_group_with_members(client)
+
+        response = client.post("/api/sms/webhook", data={
+            "From": "+15550002001", "Body": "Later please",
+            "To": "+15550001000", "AccountSid": "AC123"
+        })
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/xml"
+        assert response.text == EMPTY_TWIML
+
+        # Nothing routed yet, only the raw payload is stored
+        assert db.query(Message).count() == 0
+        assert db.query(OutboundMessage).count() == 0
+        row = db.query(InboundMessage).one()
+        assert row.status == InboundStatus.PENDING
+        assert row.payload["AccountSid"] == "AC123"
+
+    def test_worker_routes_and_fans_out(self, client, db):
+        group_id, _ = _setup_group_with_members(client)
+        client.post("/api/sms/webhook", data={
+            "From": "+15550002001", "Body": "From the queue",
+            "To": "+15550001000"
+        })
+
+        assert inbound_queue.process_pending(db) == 1
+        assert inbound_queue.process_pending(db) == 0
+
+        db.expire_all()
+        row = db.query(InboundMessage).one()
+        assert row.status == InboundStatus.PROCESSED
+        assert row.result == "Message sent to Queue TEST group"
+        message = db.query(Message).one()
+        assert (message.id, message.group_id) == (row.message_id, group_id)
+        assert sorted(
+            q.to_number for q in db.query(OutboundMessage).all()
+        ) == ["+15550002000", "+15550002002"]
+
+    def test_unroutable_sms_is_recorded(self, client, db):
+        client.post("/api/sms/webhook", data={
+            "From": "+15550009999", "Body": "Who am I",
+            "To": "+15550001000"
+        })
+
+        assert inbound_queue.process_pending(db) == 1
+
+        db.expire_all()
+        row = db.query(InboundMessage).one()
+        assert row.status == InboundStatus.PROCESSED
+        assert row.result == "User not registered"
+        assert row.message_id is None
+
+    @patch('app.services.inbound_queue.deliver_inbound')
+    def test_failed_processing_is_retried_with_backoff(
+        self, mock_deliver, client, db
+    ):
+        mock_deliver.side_effect = RuntimeError("database hiccup")
+        _setup_group_with_members(client)
+        client.post("/api/sms/webhook", data={
+            "From": "+15550002001", "Body": "Retry me",
+            "To": "+15550001000"
+        })
+
+        assert inbound_queue.process_pending(db) == 1
+
+        db.expire_all()
+        row = db.query(InboundMessage).one()
+        assert row.status == InboundStatus.PENDING
+        assert row.attempts == 1
+        assert "database hiccup" in row.last_error
+        assert row.available_at > row.claimed_at
+        assert db.query(Message).count() == 0
+
+        # Backoff keeps the row out of the next claim
+        assert inbound_queue.process_pending(db) == 0
+
+    def test_retried_message_sid_is_stored_once(self, client, db):
+        _setup_group_with_members(client)
+        sms = {"From": "+15550002001", "Body": "Only once",
+               "To": "+15550001000", "MessageSid": "SM" + "a" * 32}
+
+        for _ in range(3):
+            response = client.post("/api/sms/webhook", data=sms)
+            assert response.status_code == 200
+            assert response.text == EMPTY_TWIML
+
+        assert db.query(InboundMessage).count() == 1
+        assert inbound_queue.process_pending(db) == 1
+        assert db.query(Message).count() == 1
+
+    def test_reclaimed_row_is_routed_once(self, client, db):
+        _setup_group_with_members(client)
+        client.post("/api/sms/webhook", data={
+            "From": "+15550002001", "Body": "Slow worker",
+            "To": "+15550001000"
+        })
+        stale = inbound_queue.claim_batch(db)
+        # The reaper hands the row to a second worker, which finishes first
+        db.query(InboundMessage).update({"status": InboundStatus.PENDING})
+        db.commit()
+        inbound_queue.process_claimed(db, inbound_queue.claim_batch(db)[0])
+
+        inbound_queue.process_claimed(db, stale[0])
+
+        assert db.query(Message).count() == 1
+        assert db.query(OutboundMessage).count() == 2
+
+
+class TestIdempotentWebhook:
+    """SMS_WEBHOOK_MODE=inline dedupes on MessageSid too"""
+
+    def test_duplicate_message_sid_is_short_circuited(
+        self, client, db, query_counter
+    ):
+        _setup_group_with_members(client)
+        sms = {"From": "+15550002001", "Body": "Retried by Twilio",
+               "To": "+15550001000", "MessageSid": "SM" + "b" * 32}
+
+        first = client.post("/api/sms/webhook", data=sms)
+        assert first.json() == {"message": "Message sent to Queue TEST group"}
+        query_counter.clear()
+
+        second = client.post("/api/sms/webhook", data=sms)
+        assert second.json() == {"message": "Duplicate message ignored"}
+        # One INSERT ... ON CONFLICT DO NOTHING and nothing else
+        assert len(query_counter) == 1
+        assert "ON CONFLICT" in query_counter[0]
+
+        assert db.query(Message).count() == 1
+        assert db.query(OutboundMessage).count() == 2
+        row = db.query(InboundMessage).one()
+        assert row.status == InboundStatus.PROCESSED
+        assert row.result == "Message sent to Queue TEST group"
+
+
+class TestTwilioTransport:
+    """Pooled keep-alive transport against the local fake Twilio API"""
+
+    def _client(self, fake_twilio, pool_size=8):
+        return Client(
+            "AC00000000000000000000000000000000", "token",
+            http_client=PooledTwilioHttpClient(
+                pool_size=pool_size, base_url=fake_twilio.base_url
+            ),
+        )
+
+    def test_requests_reuse_keep_alive_connections(self, fake_twilio):
+        client = self._client(fake_twilio)
+        for i in range(10):
+            message = client.messages.create(
+                body=f"Hello {i}", from_="+15550001000", to="+15550002000"
+            )
+            assert message.sid.startswith("SM")
+
+        assert len(fake_twilio.messages) == 10
+        assert fake_twilio.connections == 1
+
+    def test_in_flight_requests_bounded_per_sender(self, fake_twilio):
+        fake_twilio.latency = 0.05
+        client = self._client(fake_twilio)
+        limiter = SenderConcurrencyLimiter(max_inflight=2)
+
+        def send(i):
+            with limiter.slot("+15550001000"):
+                return client.messages.create(
+                    body=f"Burst {i}", from_="+15550001000",
+                    to="+15550002000"
+                ).sid
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            sids = list(pool.map(send, range(16)))
+
+        assert len(set(sids)) == 16
+        # Never more than two concurrent requests, so never more than two
+        # sockets were needed
+        assert fake_twilio.connections <= 2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSenderRateLimiting:
+    """Outbound sends are paced per sender number"""
+
+    def test_each_sender_paced_independently(self):
+        clock = FakeClock()
+        scheduler = SenderRateScheduler(rate=1.0, burst=1, clock=clock)
+        for i in range(3):
+            scheduler.submit("+15550001000", f"a{i}")
+            scheduler.submit("+15550001001", f"b{i}")
+
+        # One token per number: both lanes release once, then wait
+        released = [scheduler.poll()[0], scheduler.poll()[0]]
+        assert sorted(item for _, item in released) == ["a0", "b0"]
+        ready, wait = scheduler.poll()
+        assert ready is None
+        assert wait == 1.0
+        assert scheduler.queue_depths() == {
+            "+15550001000": 2, "+15550001001": 2
+        }
+
+        clock.now = 1.0
+        assert scheduler.poll()[0] == ("+15550001000", "a1")
+        assert scheduler.poll()[0] == ("+15550001001", "b1")
+        assert scheduler.poll()[0] is None
+
+    def test_throttled_sender_is_penalized(self):
+        clock = FakeClock()
+        scheduler = SenderRateScheduler(rate=1.0, burst=1, clock=clock)
+        scheduler.submit("+15550001000", "a0")
+        scheduler.penalize("+15550001000", 5.0)
+
+        clock.now = 4.0
+        assert scheduler.poll()[0] is None
+        clock.now = 6.0
+        assert scheduler.poll()[0] == ("+15550001000", "a0")
+
+    def test_queue_depths_endpoint(self, client, db):
+        group_id, user_ids = _setup_group_with_members(client)
+        client.post(
+            f"/api/groups/{group_id}/messages",
+            json={"content": "Count me", "user_id": user_ids[0]}
+        )
+
+        response = client.get("/api/admin/outbound/queues")
+        assert response.status_code == 200
+        assert response.json()["pending"] == {"+15550001000": 2}
@@ -0,0 +1,137 @@
+"""
+Prometheus metrics tests
+
+Values are read from the default registry as deltas, since other tests
+record into the same process-wide metrics.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core import metrics
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetricsMiddleware:
+    """Request latency is labelled with the route template"""
+
+    def test_route_template_label(self):
+        router = APIRouter()
+
+        @router.get("/{group_id}/messages")
+        def messages(group_id: int):
+            return []
+
+        app = FastAPI()
+        app.include_router(router, prefix="/api/groups")
+        app.add_middleware(metrics.MetricsMiddleware)
+        client = TestClient(app)
+        labels = dict(method="GET", route="/api/groups/{group_id}/messages",
+                      status="200")
+        unmatched = dict(method="GET", route="<unmatched>", status="404")
+        before = _value("http_request_duration_seconds_count", **labels)
+        before_unmatched = _value("http_request_duration_seconds_count",
+                                  **unmatched)
+
+        client.get("/api/groups/1/messages")
+        client.get("/api/groups/2/messages")
+        client.get("/no/such/path")
+
+        assert _value("http_request_duration_seconds_count",
+                      **labels) == before + 2
+        assert _value("http_request_duration_seconds_count",
+                      **unmatched) == before_unmatched + 1
+
+
+class TestTwilioMetrics:
+    """twilio_call times calls and counts failures by status"""
+
+    def test_errors_counted_by_status(self):
+        class TwilioError(Exception):
+            status = 429
+
+        errors = _value("twilio_errors_total", status="429")
+        calls = _value("twilio_request_duration_seconds_count",
+                       outcome="error")
+
+        with pytest.raises(TwilioError):
+            with metrics.twilio_call():
+                raise TwilioError()
+
+        assert _value("twilio_errors_total", status="429") == errors + 1
+        assert _value("twilio_request_duration_seconds_count",
+                      outcome="error") == calls + 1
+
+
+class TestMetricsEndpoint:
+    """GET /metrics exposes the hot-path metrics"""
+
+    def test_fan_out_webhook_and_pool_metrics(self, client):
+        client.post("/api/admin/phone-numbers",
+                    json={"phone_number": "+15550003000"})
+        group_id = client.post(
+            "/api/groups/", json={"name": "Metrics Group"}
+        ).json()["id"]
+        for i in range(3):
+            user_id = client.post("/api/users/", json={
+                "name": f"Metrics {i}", "phone_number": f"+1555300000{i}"
+            }).json()["id"]
+            client.post(f"/api/groups/{group_id}/join/{user_id}")
+        fanouts = _value("sms_fanout_recipients_count")
+        recipients = _value("sms_fanout_recipients_sum")
+        webhooks = _value("sms_webhook_processing_seconds_count",
+                          mode="inline")
+
+        client.post("/api/sms/webhook", data={
+            "From": "+15553000000", "Body": "Measured",
+            "To": "+15550003000"
+        })
+
+        assert _value("sms_fanout_recipients_count") == fanouts + 1
+        assert _value("sms_fanout_recipients_sum") == recipients + 2
+        assert _value("sms_webhook_processing_seconds_count",
+                      mode="inline") == webhooks + 1
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'db_pool_checked_out{engine="primary"}' in response.text
+        assert "otp_sms_total" in response.text
+
+
+class TestMultiprocessMetrics:
+    """With PROMETHEUS_MULTIPROC_DIR any worker reports every worker"""
+
+    def _run(self, code, multiproc_dir):
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir))
+        env.setdefault("DATABASE_URL", "postgresql://x:y@localhost/z")
+        return subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+
+    def test_scrape_aggregates_worker_processes(self, tmp_path):
+        record = ("from app.core import metrics; "
+                  "metrics.OTP_SENT.labels('sent').inc()")
+        self._run(record, tmp_path)
+        self._run(record, tmp_path)
+
+        body = self._run(
+            "from app.core import metrics; "
+            "print(metrics.render()[0].decode())", tmp_path
+        )
+
+        assert 'otp_sms_total{outcome="sent"} 2.0' in body
+        assert "db_pool_checked_out" in body
@@ -0,0 +1,419 @@
+"""
+Query-count regression tests
+
+Hot endpoints must issue a fixed number of SQL statements regardless of
+how many rows they touch, so N+1 patterns fail here instead of in
+production.
+"""
+import logging
+
+from prometheus_client import REGISTRY
+
+from app.db import query_stats
+from app.models.models import User, Group, Message
+from app.models.phone_pool import PhoneNumber, PhoneStatus
+from app.services import membership_cache, routing_cache
+
+
+def _seed_groups(db, group_count=5, members_per_group=3):
+    users = [
+        User(name=f"Perf User {i}", phone_number=f"+1555100{i:04d}")
+        for i in range(members_per_group)
+    ]
+    groups = [Group(name=f"Perf Group {i}") for i in range(group_count)]
+    for group in groups:
+        group.users.extend(users)
+        group.member_count = len(users)
+    db.add_all(users + groups)
+    db.commit()
+    return groups, users
+
+
+def _selects(statements):
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+class TestGroupListingQueries:
+    """Group listing computes member counts without loading members"""
+
+    def test_list_groups_is_one_query(self, client, db, query_counter):
+        groups, users = _seed_groups(db, group_count=8)
+        query_counter.clear()
+
+        response = client.get("/api/groups/")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 8
+        assert all(g["user_count"] == len(users) for g in data)
+        assert len(_selects(query_counter)) == 1
+        # Counts come from groups.member_count, not from user_groups
+        assert not any("user_groups" in s for s in query_counter)
+
+    def test_search_groups_is_one_query(self, client, db, query_counter):
+        _seed_groups(db, group_count=4)
+        query_counter.clear()
+
+        response = client.get("/api/groups/?search=Group 3")
+        assert response.status_code == 200
+        assert [g["name"] for g in response.json()] == ["Perf Group 3"]
+        assert len(_selects(query_counter)) == 1
+
+    def test_empty_group_counts_zero(self, client, test_group):
+        response = client.get(f"/api/groups/{test_group.id}")
+        assert response.status_code == 200
+        assert response.json()["user_count"] == 0
+
+    def test_member_count_follows_join_and_leave(self, client, db):
+        group_id = client.post(
+            "/api/groups/", json={"name": "Counter Group"}
+        ).json()["id"]
+        user_ids = [
+            client.post("/api/users/", json={
+                "name": f"Counter {i}", "phone_number": f"+1555200000{i}"
+            }).json()["id"]
+            for i in range(3)
+        ]
+        for user_id in user_ids:
+            client.post(f"/api/groups/{group_id}/join/{user_id}")
+        # Rejected duplicate join must not bump the counter
+        client.post(f"/api/groups/{group_id}/join/{user_ids[0]}")
+        client.post(f"/api/groups/{group_id}/leave/{user_ids[1]}")
+        # Rejected second leave must not drop it either
+        client.post(f"/api/groups/{group_id}/leave/{user_ids[1]}")
+
+        response = client.get(f"/api/groups/{group_id}")
+        assert response.json()["user_count"] == 2
+
+
+class TestGroupSearch:
+    """Search is case-insensitive, ranked and paginated"""
+
+    def _create(self, client, *names):
+        return [
+            client.post("/api/groups/", json={"name": name}).json()["id"]
+            for name in names
+        ]
+
+    def test_search_is_case_insensitive_and_ranked(self, client):
+        self._create(client, "The Book Club", "book", "Bookworms",
+                     "Cooking")
+
+        response = client.get("/api/groups/?search=BOOK")
+        names = [g["name"] for g in response.json()]
+        # Exact match, then prefix match, then other substring matches
+        assert names == ["book", "Bookworms", "The Book Club"]
+
+    def test_search_treats_wildcards_literally(self, client):
+        self._create(client, "100% Fun", "100 Fun")
+
+        response = client.get("/api/groups/?search=100%")
+        assert [g["name"] for g in response.json()] == ["100% Fun"]
+
+    def test_listing_is_paginated(self, client):
+        ids = self._create(client, *[f"Page Group {i}" for i in range(5)])
+
+        first = client.get("/api/groups/?limit=2").json()
+        second = client.get("/api/groups/?limit=2&offset=2").json()
+        assert [g["id"] for g in first] == ids[:2]
+        assert [g["id"] for g in second] == ids[2:4]
+
+        assert client.get("/api/groups/?limit=0").status_code == 422
+
+
+class TestMessageHistoryPaging:
+    """History pages with before/after cursors on message id"""
+
+    def _seed_messages(self, db, count):
+        user = User(name="Historian", phone_number="+15553000000")
+        group = Group(name="History Group")
+        db.add_all([user, group])
+        db.commit()
+        messages = [
+            Message(content=f"Message {i}", user_id=user.id,
+                    group_id=group.id)
+            for i in range(count)
+        ]
+        db.add_all(messages)
+        db.commit()
+        return group, [m.id for m in messages]
+
+    def test_before_cursor_walks_back_through_history(self, client, db):
+        group, ids = self._seed_messages(db, 7)
+        url = f"/api/groups/{group.id}/messages"
+
+        page1 = client.get(url, params={"limit": 3}).json()
+        assert [m["id"] for m in page1] == ids[6:3:-1]
+
+        page2 = client.get(
+            url, params={"limit": 3, "before": page1[-1]["id"]}
+        ).json()
+        assert [m["id"] for m in page2] == ids[3:0:-1]
+
+        page3 = client.get(
+            url, params={"limit": 3, "before": page2[-1]["id"]}
+        ).json()
+        assert [m["id"] for m in page3] == [ids[0]]
+
+    def test_after_cursor_returns_newer_messages(self, client, db):
+        group, ids = self._seed_messages(db, 5)
+
+        response = client.get(
+            f"/api/groups/{group.id}/messages",
+            params={"after": ids[1], "limit": 2}
+        )
+        # The two messages right after the cursor, newest first
+        assert [m["id"] for m in response.json()] == [ids[3], ids[2]]
+
+
+class TestMessageHistoryQueries:
+    """History loads authors with the messages, not one query each"""
+
+    def test_history_page_is_one_query(self, client, db, query_counter):
+        authors = [
+            User(name=f"Author {i}", phone_number=f"+1555400000{i}")
+            for i in range(5)
+        ]
+        group = Group(name="Chatty Group")
+        db.add_all(authors + [group])
+        db.commit()
+        db.add_all([
+            Message(content=f"Hi {i}", user_id=authors[i % 5].id,
+                    group_id=group.id)
+            for i in range(20)
+        ])
+        db.commit()
+        query_counter.clear()
+
+        response = client.get(f"/api/groups/{group.id}/messages")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 20
+        assert {m["user_name"] for m in data} == {a.name for a in authors}
+        assert len(_selects(query_counter)) == 1
+
+
+class TestMessageHistoryDeltaSync:
+    """Pollers fetch only new messages and revalidate with an ETag"""
+
+    def _seed(self, db, count=3):
+        user = User(name="Poller", phone_number="+15555000000")
+        group = Group(name="Delta Group")
+        db.add_all([user, group])
+        db.commit()
+        messages = [
+            Message(content=f"Delta {i}", user_id=user.id, group_id=group.id)
+            for i in range(count)
+        ]
+        db.add_all(messages)
+        db.commit()
+        return group, user, [m.id for m in messages]
+
+    def test_since_id_returns_only_new_messages(self, client, db):
+        group, user, ids = self._seed(db)
+        url = f"/api/groups/{group.id}/messages"
+
+        response = client.get(url, params={"since_id": ids[0]})
+        assert [m["id"] for m in response.json()] == [ids[2], ids[1]]
+
+        response = client.get(url, params={"since_id": ids[2]})
+        assert response.status_code == 200
+        assert response.json() == []
+        assert response.headers["ETag"] == f'W/"{group.id}-{ids[2]}-50"'
+
+    def test_unchanged_history_revalidates_with_304(
+        self, client, db, query_counter
+    ):
+        group, user, ids = self._seed(db)
+        url = f"/api/groups/{group.id}/messages"
+        etag = client.get(url).headers["ETag"]
+        query_counter.clear()
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        # Only the index-only newest-id lookup ran
+        assert len(_selects(query_counter)) == 1
+        assert "messages.content" not in query_counter[0]
+
+        db.add(Message(content="Fresh", user_id=user.id, group_id=group.id))
+        db.commit()
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()[0]["content"] == "Fresh"
+        assert response.headers["ETag"] != etag
+
+    def test_etag_only_validates_the_same_latest_page(self, client, db):
+        group, user, ids = self._seed(db)
+        url = f"/api/groups/{group.id}/messages"
+        etag = client.get(url, params={"limit": 2}).headers["ETag"]
+
+        # Same page: nothing new
+        assert client.get(url, params={"limit": 2}, headers={
+            "If-None-Match": etag
+        }).status_code == 304
+        # An older page was never sent under this tag
+        response = client.get(url, params={"limit": 2, "before": ids[2]},
+                              headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert [m["id"] for m in response.json()] == [ids[1], ids[0]]
+        # Nor was a page of another size
+        response = client.get(url, params={"limit": 3},
+                              headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()) == 3
+
+
+class TestWebhookQueries:
+    """With warm caches an inbound SMS costs one SELECT"""
+
+    def _setup(self, client, member_count=5):
+        client.post("/api/admin/phone-numbers",
+                    json={"phone_number": "+15550006000"})
+        group_id = client.post(
+            "/api/groups/", json={"name": "Inbound Group"}
+        ).json()["id"]
+        for i in range(member_count):
+            user_id = client.post("/api/users/", json={
+                "name": f"Inbound {i}", "phone_number": f"+1555600000{i}"
+            }).json()["id"]
+            client.post(f"/api/groups/{group_id}/join/{user_id}")
+        return group_id
+
+    def test_pool_number_routing_is_one_select(self, client, db,
+                                               query_counter):
+        group_id = self._setup(client)
+        routing_cache.pool_numbers.lookup(db, "+15550006000")
+        membership_cache.group_members.members(db, group_id)
+        query_counter.clear()
+
+        response = client.post("/api/sms/webhook", data={
+            "From": "+15556000001", "Body": "Hello all",
+            "To": "+15550006000"
+        })
+        assert response.json() == {
+            "message": "Message sent to Inbound Group group"
+        }
+        # Routing, then the message INSERT and the fan-out INSERT
+        assert len(_selects(query_counter)) == 1
+        assert len(query_counter) <= 4
+
+    def test_fallback_routing_is_one_select(self, client, db,
+                                            query_counter):
+        group_id = self._setup(client, 2)
+        client.post("/api/groups/", json={"name": "Other Group"})
+        routing_cache.pool_numbers.lookup(db, "+15550009999")
+        membership_cache.group_members.members(db, group_id)
+        query_counter.clear()
+
+        response = client.post("/api/sms/webhook", data={
+            "From": "+15556000000", "Body": '@"inbound group" Hi',
+            "To": "+15550009999"
+        })
+        assert response.json() == {
+            "message": "Message sent to Inbound Group group"
+        }
+        assert len(_selects(query_counter)) == 1
+
+
+class TestRoutingCache:
+    """Pool number -> group resolution is served from memory"""
+
+    def test_warm_cache_skips_phone_numbers(self, client, db,
+                                            query_counter):
+        client.post("/api/admin/phone-numbers",
+                    json={"phone_number": "+15550006100"})
+        group_id = client.post(
+            "/api/groups/", json={"name": "Cached Group"}
+        ).json()["id"]
+        query_counter.clear()
+
+        assert routing_cache.pool_numbers.lookup(db, "+15550006100") == (
+            group_id, "Cached Group"
+        )
+        assert routing_cache.pool_numbers.lookup(db, "+15550006199") is None
+        # One load for both lookups, including the miss
+        assert len(_selects(query_counter)) == 1
+
+    def test_status_change_invalidates(self, client, db):
+        phone_id = client.post("/api/admin/phone-numbers",
+                               json={"phone_number": "+15550006200"}
+                               ).json()["id"]
+        client.post("/api/groups/", json={"name": "Released Group"})
+        assert routing_cache.pool_numbers.lookup(db, "+15550006200")
+
+        client.put(f"/api/admin/phone-numbers/{phone_id}/status",
+                   params={"status": "INACTIVE"})
+        assert routing_cache.pool_numbers.lookup(db, "+15550006200") is None
+
+    def test_startup_warm_up_is_discarded(self, client, db):
+        # Rows written directly fire no phone_assigned event, so only a
+        # cache emptied after app startup (which warms it from the dev
+        # database) can see them
+        group = Group(name="Direct Group")
+        db.add(group)
+        db.flush()
+        db.add(PhoneNumber(phone_number="+15550006250",
+                           status=PhoneStatus.ASSIGNED, group_id=group.id))
+        db.commit()
+
+        assert routing_cache.pool_numbers.lookup(db, "+15550006250") == (
+            group.id, "Direct Group"
+        )
+
+    def test_entries_expire(self, db):
+        clock = [0.0]
+        cache = routing_cache.PoolNumberCache(ttl=10,
+                                              clock=lambda: clock[0])
+        cache.lookup(db, "+15550006300")
+        assert cache._fresh()
+        clock[0] = 11.0
+        assert not cache._fresh()
+
+
+class TestRequestQueryStats:
+    """Per-request query counts, debug headers and slow-query logging"""
+
+    def test_debug_headers_report_query_count(self, client, db,
+                                              monkeypatch):
+        _seed_groups(db, group_count=3)
+        monkeypatch.setattr(query_stats, "DEBUG_HEADERS", True)
+
+        response = client.get("/api/groups/")
+        assert response.headers["X-DB-Query-Count"] == "1"
+        assert response.headers["X-DB-Query-Time"].endswith("ms")
+
+        monkeypatch.setattr(query_stats, "DEBUG_HEADERS", False)
+        assert "X-DB-Query-Count" not in client.get("/api/groups/").headers
+
+    def test_counts_observed_per_route(self, client, db):
+        _seed_groups(db, group_count=2)
+        labels = {"route": "/api/groups/"}
+        count = REGISTRY.get_sample_value(
+            "db_queries_per_request_count", labels
+        ) or 0
+        total = REGISTRY.get_sample_value(
+            "db_queries_per_request_sum", labels
+        ) or 0
+
+        client.get("/api/groups/")
+
+        assert REGISTRY.get_sample_value(
+            "db_queries_per_request_count", labels
+        ) == count + 1
+        assert REGISTRY.get_sample_value(
+            "db_queries_per_request_sum", labels
+        ) == total + 1
+
+    def test_slow_queries_logged_with_route(self, client, db, caplog,
+                                            monkeypatch):
+        _seed_groups(db, group_count=1)
+        monkeypatch.setattr(query_stats, "SLOW_QUERY_SECONDS", 0)
+        caplog.set_level(logging.WARNING, logger="app.db.query_stats")
+
+        client.get("/api/groups/?search=Perf")
+
+        [record] = [r for r in caplog.records
+                    if r.name == "app.db.query_stats"]
+        message = record.getMessage()
+        assert "in GET /api/groups/:" in message
+        assert "FROM groups" in message
@@ -0,0 +1,90 @@
+"""
+Read replica routing tests
+
+Read-only endpoints use the replica unless it is down or the client has
+just written.
+"""
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app.db import database
+from app.db.database import (
+    READ_PRIMARY_COOKIE, ReadYourWritesMiddleware, ReplicaHealth
+)
+
+# Nothing listens on port 1, so connecting fails immediately
+UNREACHABLE_URL = "postgresql://nobody@127.0.0.1:1/none"
+
+
+def _request(cookies=""):
+    headers = [(b"cookie", cookies.encode())] if cookies else []
+    return Request({"type": "http", "headers": headers})
+
+
+def _use_replica(monkeypatch, url=UNREACHABLE_URL):
+    replica = create_engine(url)
+    monkeypatch.setattr(database, "replica_engine", replica)
+    monkeypatch.setattr(database, "ReplicaSessionLocal",
+                        sessionmaker(bind=replica))
+    monkeypatch.setattr(database, "replica_health", ReplicaHealth(30))
+
+
+class TestReadRouting:
+    """get_read_db picks the replica or the primary"""
+
+    def test_no_replica_configured(self):
+        assert database.replica_engine is None
+        assert database.reads_from_replica(_request()) is False
+
+    def test_recent_writer_reads_primary(self, monkeypatch):
+        _use_replica(monkeypatch)
+        assert database.reads_from_replica(_request()) is True
+
+        pinned = f"{READ_PRIMARY_COOKIE}={time.time() + 5}"
+        assert database.reads_from_replica(_request(pinned)) is False
+
+        expired = f"{READ_PRIMARY_COOKIE}={time.time() - 1}"
+        assert database.reads_from_replica(_request(expired)) is True
+
+    def test_unreachable_replica_falls_back_to_primary(self, monkeypatch):
+        _use_replica(monkeypatch)
+
+        sessions = database.get_read_db(_request())
+        db = next(sessions)
+        assert db.get_bind() is database.engine
+        sessions.close()
+
+        # The replica is skipped until the retry window passes
+        assert not database.replica_health.available()
+        assert database.reads_from_replica(_request()) is False
+
+
+class TestReadYourWritesMiddleware:
+    """Successful writes pin the client to the primary"""
+
+    def _client(self):
+        app = FastAPI()
+        app.add_middleware(ReadYourWritesMiddleware, window=5)
+
+        @app.get("/read")
+        def read():
+            return {}
+
+        @app.post("/write")
+        def write():
+            return {}
+
+        return TestClient(app)
+
+    def test_cookie_set_only_after_writes(self):
+        client = self._client()
+
+        assert READ_PRIMARY_COOKIE not in client.get("/read").cookies
+        response = client.post("/write")
+        until = float(response.cookies[READ_PRIMARY_COOKIE])
+        assert time.time() < until <= time.time() + 5
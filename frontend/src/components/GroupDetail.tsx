@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { ArrowLeft, LogOut, Users, MessageSquare, Clock, User as UserIcon, Send } from 'lucide-react';
 import api from '../services/api';
@@ -12,6 +12,17 @@ interface ExtendedMessage extends Message {
   user_name: string;
 }
 
+const PAGE_SIZE = 50;
+// Safety-net poll; new messages normally arrive over the SSE stream
+const FALLBACK_POLL_MS = 30000;
+
+// Combine pages newest-first, dropping duplicates by id
+const mergeMessages = (current: ExtendedMessage[], incoming: ExtendedMessage[]) => {
+  const byId = new Map<number, ExtendedMessage>();
+  [...current, ...incoming].forEach(message => byId.set(message.id, message));
+  return [...byId.values()].sort((a, b) => b.id - a.id);
+};
+
 function GroupDetail({ currentUser }: GroupDetailProps) {
   const { groupId } = useParams<{ groupId: string }>();
   const navigate = useNavigate();
@@ -20,6 +31,10 @@ function GroupDetail({ currentUser }: GroupDetailProps) {
   const [isLoading, setIsLoading] = useState(true);
   const [newMessage, setNewMessage] = useState('');
   const [isSending, setIsSending] = useState(false);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+  // Newest message id seen, so polls only ask for what came after it
+  const newestIdRef = useRef<number | null>(null);
 
   // Move function definitions BEFORE useEffect
   const fetchGroupDetails = useCallback(async () => {
@@ -36,19 +51,69 @@ function GroupDetail({ currentUser }: GroupDetailProps) {
   const fetchMessages = useCallback(async () => {
     try {
       console.log('Fetching messages for group:', groupId); // Debug log
-      const response = await api.get<ExtendedMessage[]>(`/groups/${groupId}/messages`);
+      const sinceId = newestIdRef.current;
+      const response = await api.get<ExtendedMessage[]>(`/groups/${groupId}/messages`, {
+        params: sinceId === null ? { limit: PAGE_SIZE } : { since_id: sinceId }
+      });
       console.log('Messages response:', response.data); // Debug log
-      setMessages(response.data);
+      if (response.data.length > 0) {
+        newestIdRef.current = Math.max(sinceId ?? 0, response.data[0].id);
+      }
+      // Keep any older pages the user already scrolled back through
+      setMessages(prev => mergeMessages(prev, response.data));
+      if (sinceId === null) {
+        setHasOlder(response.data.length === PAGE_SIZE);
+      }
     } catch (err) {
       console.error('Failed to fetch messages:', err);
     }
   }, [groupId]);
 
+  const fetchOlderMessages = async () => {
+    if (messages.length === 0 || isLoadingOlder) return;
+
+    setIsLoadingOlder(true);
+    try {
+      const oldestId = messages[messages.length - 1].id;
+      const response = await api.get<ExtendedMessage[]>(`/groups/${groupId}/messages`, {
+        params: { before: oldestId, limit: PAGE_SIZE }
+      });
+      setMessages(prev => mergeMessages(prev, response.data));
+      setHasOlder(response.data.length === PAGE_SIZE);
+    } catch (err) {
+      console.error('Failed to fetch older messages:', err);
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
   useEffect(() => {
+    setMessages([]);
+    setHasOlder(false);
+    newestIdRef.current = null;
     fetchGroupDetails();
     fetchMessages();
-    const interval = setInterval(fetchMessages, 5000);
-    return () => clearInterval(interval);
+
+    // Push channel: catch up with a delta fetch whenever it (re)connects,
+    // then merge messages as the server publishes them
+    const stream = new EventSource(`${api.defaults.baseURL}/groups/${groupId}/stream`);
+    stream.addEventListener('ready', () => fetchMessages());
+    stream.addEventListener('message_created', (event) => {
+      const message: ExtendedMessage = JSON.parse((event as MessageEvent).data);
+      // Oversized messages arrive as ids only; fetch the full rows
+      if (message.content === undefined) {
+        fetchMessages();
+        return;
+      }
+      newestIdRef.current = Math.max(newestIdRef.current ?? 0, message.id);
+      setMessages(prev => mergeMessages(prev, [message]));
+    });
+
+    const interval = setInterval(fetchMessages, FALLBACK_POLL_MS);
+    return () => {
+      stream.close();
+      clearInterval(interval);
+    };
   }, [groupId, fetchGroupDetails, fetchMessages]);
 
   const handleLeaveGroup = async () => {
@@ -181,6 +246,17 @@ function GroupDetail({ currentUser }: GroupDetailProps) {
         </h3>
         
         <div className="space-y-3 max-h-[500px] overflow-y-auto">
+          {hasOlder && (
+            <div className="text-center">
+              <button
+                onClick={fetchOlderMessages}
+                disabled={isLoadingOlder}
+                className="text-sm text-indigo-600 hover:text-indigo-800 disabled:opacity-50"
+              >
+                {isLoadingOlder ? 'Loading...' : 'Load older messages'}
+              </button>
+            </div>
+          )}
           {messages.length === 0 ? (
             <div className="text-center py-16">
               <MessageSquare className="h-16 w-16 text-gray-300 mx-auto mb-4" />
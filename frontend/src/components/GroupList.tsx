@@ -4,6 +4,10 @@ import { Users, Plus, Search, Eye, Rocket, CheckCircle } from 'lucide-react';
 import api from '../services/api';
 import { User, Group } from '../types';
 
+const SEARCH_DEBOUNCE_MS = 300;
+// Matches the backend's default page size for GET /groups/
+const GROUPS_PAGE_SIZE = 50;
+
 interface GroupListProps {
   currentUser: User;
 }
@@ -11,21 +15,55 @@ interface GroupListProps {
 function GroupList({ currentUser }: GroupListProps) {
   const [groups, setGroups] = useState<Group[]>([]);
   const [searchTerm, setSearchTerm] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
   const [newGroupName, setNewGroupName] = useState('');
   const [userGroups, setUserGroups] = useState<Set<number>>(new Set());
   const [isCreating, setIsCreating] = useState(false);
+  const [hasMoreGroups, setHasMoreGroups] = useState(false);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const navigate = useNavigate();
 
+  // Only query the backend once typing pauses, not on every keystroke
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(searchTerm.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  const fetchGroupPage = useCallback(async (offset: number) => {
+    const response = await api.get<Group[]>('/groups/', {
+      params: {
+        ...(debouncedSearch ? { search: debouncedSearch } : {}),
+        limit: GROUPS_PAGE_SIZE,
+        offset
+      }
+    });
+    // A full page means there may be more groups after it
+    setHasMoreGroups(response.data.length === GROUPS_PAGE_SIZE);
+    return response.data;
+  }, [debouncedSearch]);
+
   const fetchGroups = useCallback(async () => {
     try {
-      const response = await api.get<Group[]>('/groups/', {
-        params: searchTerm ? { search: searchTerm } : {}
-      });
-      setGroups(response.data);
+      setGroups(await fetchGroupPage(0));
     } catch (err) {
       console.error('Failed to fetch groups:', err);
     }
-  }, [searchTerm]);
+  }, [fetchGroupPage]);
+
+  const loadMoreGroups = async () => {
+    setIsLoadingMore(true);
+    try {
+      const page = await fetchGroupPage(groups.length);
+      setGroups(prev => {
+        const seen = new Set(prev.map(group => group.id));
+        return [...prev, ...page.filter(group => !seen.has(group.id))];
+      });
+    } catch (err) {
+      console.error('Failed to load more groups:', err);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
   const fetchUserGroups = useCallback(async () => {
     if (!currentUser) return;
@@ -177,6 +215,18 @@ function GroupList({ currentUser }: GroupListProps) {
             })}
           </div>
         )}
+
+        {hasMoreGroups && (
+          <div className="mt-6 text-center">
+            <button
+              onClick={loadMoreGroups}
+              disabled={isLoadingMore}
+              className="px-6 py-2 border border-gray-300 rounded-lg text-sm font-medium text-gray-700 bg-white hover:bg-gray-50 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-indigo-500 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              {isLoadingMore ? 'Loading...' : 'Load more groups'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );